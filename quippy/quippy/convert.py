@@ -24,7 +24,6 @@
 Conversions between ase and fortran atoms objects
 """
 import inspect
-from copy import deepcopy as cp
 
 import _quippy
 import ase
@@ -32,7 +31,8 @@ import f90wrap.runtime
 import numpy as np
 import quippy
 
-__all__ = ['ase_to_quip', 'descriptor_data_mono_to_dict', 'velocities_ase_to_quip', 'velocities_quip_to_ase', 'set_doc']
+__all__ = ['ase_to_quip', 'descriptor_data_mono_to_dict', 'velocities_ase_to_quip', 'velocities_quip_to_ase', 'set_doc',
+           'get_neighbour_list']
 
 # conversion between ase and quip mass, taken from Fortran source
 MASSCONVERT = 103.6426957074462
@@ -74,14 +74,20 @@ def ase_to_quip(ase_atoms: ase.Atoms, quip_atoms=None, add_arrays=None, add_info
 
     Logical arrays are kept as ones and zeros, and normally retrieved as int32.
 
+    When an existing `quip_atoms` of the same length is given, it is updated in place: the lattice and
+    species are only set again if the cell or atomic numbers changed, and positions and velocities are
+    written straight into its arrays. This is much cheaper than a new conversion for repeated calls on
+    the same system.
+
     :param ase_atoms:
-    :param quip_atoms:
+    :param quip_atoms: existing quip atoms object to update, a new one is made if not given
     :param add_arrays: keys to take from ase.Atoms.arrays
     :param add_info:  keys to take from ase.Atoms.info
     :return:
     """
 
-    lattice = ase_atoms.get_cell().T.copy()
+    lattice = ase_atoms.cell.array.T
+    new_atoms = True
     if quip_atoms is not None:
         if isinstance(quip_atoms, quippy.atoms_types_module.Atoms):
             # check if the length matches, otherwise make a new one in place of that
@@ -89,8 +95,10 @@ def ase_to_quip(ase_atoms: ase.Atoms, quip_atoms=None, add_arrays=None, add_info
                 # need to regenerate the quip atoms object
                 quip_atoms = quippy.atoms_types_module.Atoms(len(ase_atoms), lattice)
             else:
-                # but the cell needs to be set anyways
-                quip_atoms.set_lattice(lattice, scale_positions=False)
+                # update the existing one in place, skipping the parts that have not changed
+                new_atoms = False
+                if not np.array_equal(quip_atoms.lattice, lattice):
+                    quip_atoms.set_lattice(lattice, scale_positions=False)
         else:
             # raise an error for the wrong object given
             raise TypeError('quip_atoms argument is not of valid type, cannot work with it')
@@ -99,16 +107,21 @@ def ase_to_quip(ase_atoms: ase.Atoms, quip_atoms=None, add_arrays=None, add_info
         # need to regenerate the quip atoms object
         quip_atoms = quippy.atoms_types_module.Atoms(len(ase_atoms), lattice)
 
-    quip_atoms.pos[:] = ase_atoms.get_positions().T.copy()
-    quip_atoms.is_periodic[:] = ase_atoms.get_pbc()
-    quip_atoms.z[:] = ase_atoms.numbers
-    quip_atoms.set_atoms(quip_atoms.z)  # set species and mass
+    # assignment to the Fortran arrays copies, no intermediate copies needed
+    quip_atoms.pos[:] = ase_atoms.positions.T
+    quip_atoms.is_periodic[:] = ase_atoms.pbc
+    if new_atoms or not np.array_equal(quip_atoms.z, ase_atoms.numbers):
+        quip_atoms.z[:] = ase_atoms.numbers
+        quip_atoms.set_atoms(quip_atoms.z)  # set species and mass
 
     if ase_atoms.has('momenta'):
         # if ase atoms has momenta then add velocities to the quip object
-        # workaround for the interfaces not behaving properly in the wrapped code, see f90wrap issue #86
-        _quippy.f90wrap_atoms_add_property_real_2da(this=quip_atoms._handle, name='velo',
-                                                    value=velocities_ase_to_quip(ase_atoms.get_velocities()))
+        if not new_atoms and quip_atoms.has_property('velo'):
+            quip_atoms.velo[:] = velocities_ase_to_quip(ase_atoms.get_velocities())
+        else:
+            # workaround for the interfaces not behaving properly in the wrapped code, see f90wrap issue #86
+            _quippy.f90wrap_atoms_add_property_real_2da(this=quip_atoms._handle, name='velo',
+                                                        value=velocities_ase_to_quip(ase_atoms.get_velocities()))
 
     def key_spec_to_list(keyspec, default, exclude=()):
         if keyspec is True:
@@ -127,26 +140,17 @@ def ase_to_quip(ase_atoms: ase.Atoms, quip_atoms=None, add_arrays=None, add_info
 
         return keyspec
 
-    # go through all properties for issue#170
+    # go through all properties for issue#170, missing keys are skipped
+    # fixme: give some warning for missing keys if needed
     if add_arrays is not None:
         add_arrays = key_spec_to_list(add_arrays, ase_atoms.arrays, exclude=['numbers', 'positions', 'momenta'])
-        for info_name in add_arrays:
-            try:
-                value = np.array(ase_atoms.arrays[info_name])
-            except KeyError:
-                # fixme: give some warning here if needed
-                continue
-            add_property_array(quip_atoms, info_name, value)
+        add_property_arrays(quip_atoms, {info_name: ase_atoms.arrays[info_name] for info_name in add_arrays
+                                         if info_name in ase_atoms.arrays})
 
     if add_info is not None:
         add_info = key_spec_to_list(add_info, ase_atoms.info, exclude=[])
-        for info_name in add_info:
-            try:
-                value = np.array(ase_atoms.info[info_name])
-            except KeyError:
-                # fixme: give some warning here if needed
-                continue
-            add_param_value(quip_atoms, info_name, value)
+        add_param_values(quip_atoms, {info_name: ase_atoms.info[info_name] for info_name in add_info
+                                      if info_name in ase_atoms.info})
 
     return quip_atoms
 
@@ -171,54 +175,21 @@ def add_param_value(quip_atoms, name, value):
     :param value:
     :return:
     """
-    # to make sure it is a numpy array, so we can use the dtype and shape of it
-    if not isinstance(value, np.ndarray):
-        value = np.array(value)
-
-    # decide type
-    arr_dtype_kind = value.dtype.kind
-    dim = len(value.shape)
-    if arr_dtype_kind == 'b':
-        # only 1D works, 0->1
-        fortran_type_name = 'l'
-        if dim >= 2:
-            raise TypeError('2d logical array is not supported')
-        elif dim == 0:
-            # change to a one dimension instead
-            value = np.atleast_1d(value)
-            dim = len(value.shape)  # update dimension!!!
-    elif arr_dtype_kind in ['u', 'i']:
-        # 0,1,2 are all working
-        fortran_type_name = 'i'
-    elif arr_dtype_kind == 'f':
-        # only 1,2 D works, 0->1
-        fortran_type_name = 'r'
-        if dim == 0:
-            # change to a one dimension instead
-            value = np.atleast_1d(value)
-            dim = len(value.shape)  # update dimension!!!
-    else:
-        # so it is one of:
-        # c complex floating - point
-        # m timedelta
-        # M datetime
-        # O object
-        # V void
-        # strings not supported yet, f90wrap_atoms_add_property_str needs some
-        raise TypeError('given dtype ({}) is not supported'.format(arr_dtype_kind))
+    setter, value = _param_setter(value)
+    setter(this=quip_atoms.params._handle, key=name, value=value)
 
-    # decide dim
-    if dim == 0:
-        add_property_method = getattr(_quippy, 'f90wrap_dictionary_set_value_{}'.format(fortran_type_name))
-    elif dim == 1:
-        add_property_method = getattr(_quippy, 'f90wrap_dictionary_set_value_{}_a'.format(fortran_type_name))
-    elif dim == 2:
-        add_property_method = getattr(_quippy, 'f90wrap_atoms_add_property_{}_2da'.format(fortran_type_name))
-        value = value.T
-    else:
-        raise ValueError(
-            'unsupported dimension ({}) of attribute in conversion from ase to quip atoms objects'.format(dim))
-    add_property_method(this=quip_atoms.params._handle, key=name, value=value)
+
+def add_param_values(quip_atoms, params):
+    """
+    Adds all the items of the dictionary `params` to the params dictionary of a quip atoms object,
+    as add_param_value() does for a single one.
+
+    The types of all the values are checked before any of them is added.
+    """
+    setters = [(name,) + _param_setter(value) for name, value in params.items()]
+    handle = quip_atoms.params._handle
+    for name, setter, value in setters:
+        setter(this=handle, key=name, value=value)
 
 
 def add_property_array(quip_atoms, name, value):
@@ -241,27 +212,53 @@ def add_property_array(quip_atoms, name, value):
     :param value:
     :return:
     """
-    # to make sure it is a numpy array, so we can use the dtype and shape of it
-    if not isinstance(value, np.ndarray):
-        value = np.array(value)
+    setter, value = _property_setter(value)
+    setter(this=quip_atoms._handle, name=name, value=value)
 
-    # add the value, 1d/2d array
-    dim = len(value.shape)
-    arr_dtype_kind = value.dtype.kind
 
-    # decide the fortran type
-    if arr_dtype_kind == 'b':
-        if dim < 2:
-            fortran_type_name = 'logical'
-        else:
-            raise TypeError('2d logical array is not supported')
-    elif arr_dtype_kind in ['u', 'i']:
-        fortran_type_name = 'int'
-    elif arr_dtype_kind == 'f':
-        fortran_type_name = 'real'
-    # elif arr_dtype_kind in ['S', 'U']:
-    #     fortran_type_name = 'str'
-    else:
+def add_property_arrays(quip_atoms, arrays):
+    """
+    Adds all the arrays in the dictionary `arrays` to a quip atoms object as properties,
+    as add_property_array() does for a single one.
+
+    The types and shapes of all the arrays are checked before any of them is added.
+    """
+    setters = [(name,) + _property_setter(value) for name, value in arrays.items()]
+    handle = quip_atoms._handle
+    for name, setter, value in setters:
+        setter(this=handle, name=name, value=value)
+
+
+# Fortran routines for setting params and adding properties, by dtype kind and number of dimensions
+# of the value. Scalar logical and real params are stored as arrays of one element. 2D arrays are
+# passed transposed. Logical arrays are kept as ones and zeros, and normally retrieved as int32.
+_PARAM_SETTERS = {('b', 0): _quippy.f90wrap_dictionary_set_value_l_a,
+                  ('b', 1): _quippy.f90wrap_dictionary_set_value_l_a,
+                  ('i', 0): _quippy.f90wrap_dictionary_set_value_i,
+                  ('i', 1): _quippy.f90wrap_dictionary_set_value_i_a,
+                  ('i', 2): _quippy.f90wrap_dictionary_set_value_i_a2,
+                  ('f', 0): _quippy.f90wrap_dictionary_set_value_r_a,
+                  ('f', 1): _quippy.f90wrap_dictionary_set_value_r_a,
+                  ('f', 2): _quippy.f90wrap_dictionary_set_value_r_a2}
+
+_PROPERTY_SETTERS = {('b', 1): _quippy.f90wrap_atoms_add_property_logical_a,
+                     ('i', 1): _quippy.f90wrap_atoms_add_property_int_a,
+                     ('i', 2): _quippy.f90wrap_atoms_add_property_int_2da,
+                     ('f', 1): _quippy.f90wrap_atoms_add_property_real_a,
+                     ('f', 2): _quippy.f90wrap_atoms_add_property_real_2da}
+
+
+def _fortran_setter(value, setters, allowed_dims):
+    """
+    Finds the Fortran routine in `setters` for the array `value`, and returns it together with
+    the value in the form it needs to be passed in.
+    """
+    # to make sure it is a numpy array, so we can use the dtype and shape of it
+    value = np.asarray(value)
+    kind = 'i' if value.dtype.kind == 'u' else value.dtype.kind
+    dim = value.ndim
+
+    if kind not in ('b', 'i', 'f'):
         # so it is one of:
         # c complex floating - point
         # m timedelta
@@ -269,18 +266,26 @@ def add_property_array(quip_atoms, name, value):
         # O object
         # V void
         # strings not supported yet, f90wrap_atoms_add_property_str needs some
-        raise TypeError('given dtype ({}) is not supported'.format(arr_dtype_kind))
-
-    # decide dim
-    if dim == 1:
-        add_property_method = getattr(_quippy, 'f90wrap_atoms_add_property_{}_a'.format(fortran_type_name))
-        add_property_method(this=quip_atoms._handle, name=name, value=value)
-    elif dim == 2:
-        add_property_method = getattr(_quippy, 'f90wrap_atoms_add_property_{}_2da'.format(fortran_type_name))
-        add_property_method(this=quip_atoms._handle, name=name, value=value.T)
-    else:
+        raise TypeError('given dtype ({}) is not supported'.format(value.dtype.kind))
+    if dim not in allowed_dims:
         raise ValueError(
             'unsupported dimension ({}) of attribute in conversion from ase to quip atoms objects'.format(dim))
+    if (kind, dim) not in setters:
+        raise TypeError('{}d logical array is not supported'.format(dim))
+
+    if dim == 0 and kind != 'i':
+        value = np.atleast_1d(value)
+    elif dim == 2:
+        value = value.T
+    return setters[kind, dim], value
+
+
+def _param_setter(value):
+    return _fortran_setter(value, _PARAM_SETTERS, (0, 1, 2))
+
+
+def _property_setter(value):
+    return _fortran_setter(value, _PROPERTY_SETTERS, (1, 2))
 
 
 def velocities_ase_to_quip(velocities):
@@ -305,6 +310,63 @@ def velocities_quip_to_ase(velocities):
     return (velocities * np.sqrt(MASSCONVERT)).T
 
 
+def get_neighbour_list(quip_atoms, cutoff=None, diff=False, calc_connect=True):
+    """
+    Neighbour list of a quippy Atoms object as numpy arrays, in compressed sparse row form
+
+    The arrays are allocated here and filled by the Fortran code in a single pass over the
+    neighbour tables, and the values returned are views of them. Indices are zero-based:
+    the neighbours of atom `i` are `j[index[i]:index[i + 1]]`, the same as one would get
+    looping over `quip_atoms.neighbour(i + 1, n)`.
+
+    Parameters
+    ----------
+    quip_atoms: quippy.atoms_types_module.Atoms
+    cutoff: float, optional
+        only neighbours closer than this are returned. The cutoff of `quip_atoms` is
+        raised to this if it is smaller.
+    diff: bool
+        also return the difference vectors
+    calc_connect: bool
+        calculate the connectivity first. Set to False if it is already up to date.
+
+    Returns
+    -------
+    index: (N + 1,) int array, start of the neighbours of each atom
+    j: (n_pairs,) int array, neighbour indices
+    shift: (n_pairs, 3) int array, periodic image of the neighbours
+    distance: (n_pairs,) float array
+    diff: (n_pairs, 3) float array, only if `diff` is True
+    """
+
+    if not isinstance(quip_atoms, quippy.atoms_types_module.Atoms):
+        raise TypeError('quip_atoms argument is not a quippy.atoms_types_module.Atoms')
+
+    if cutoff is not None and quip_atoms.cutoff < cutoff:
+        quip_atoms.set_cutoff(cutoff)
+        calc_connect = True
+    if calc_connect:
+        quip_atoms.calc_connect()
+
+    n_max = quip_atoms.n_neighbours_total()
+    index = np.empty(quip_atoms.n + 1, dtype=np.int32)
+    j = np.empty(n_max, dtype=np.int32)
+    shift = np.empty((3, n_max), dtype=np.int32, order='F')
+    distance = np.empty(n_max)
+    diff_vectors = np.empty((3, n_max), order='F') if diff else None
+
+    n_pairs = quip_atoms.neighbour_list(index, j, shift, distance, diff=diff_vectors, max_dist=cutoff)
+
+    # fortran indices are one-based
+    index -= 1
+    j -= 1
+
+    result = (index, j[:n_pairs], shift.T[:n_pairs], distance[:n_pairs])
+    if diff:
+        result += (diff_vectors.T[:n_pairs],)
+    return result
+
+
 def descriptor_data_mono_to_dict(desc_data_mono):
     """
     Returns a dictionary out of the descriptor_data_mono object with all info it contained.
@@ -337,34 +399,65 @@ def descriptor_data_mono_to_dict(desc_data_mono):
     return out_data_dict
 
 
-def get_dict_arrays(fdict):
-    """Takes the arrays from a quippy dictionary. Copies.
+def get_dict_arrays(fdict, skip_keys=(), copy=True):
+    """Takes the arrays from a quippy dictionary. Copies, unless `copy=False` is given.
 
-    Probably fails if there are non-array elements in the dictionary"""
+    Keys in `skip_keys` are not taken. Without copying, the arrays returned are views
+    of the Fortran storage and are only valid while the dictionary is unchanged.
+
+    The types of all the entries are looked up in one go. Scalar integer, real, complex,
+    logical and string entries are returned as python values, data and dictionary
+    entries are left out."""
 
     if not isinstance(fdict, quippy.dictionary_module.Dictionary):
         raise TypeError('fdict argument is not a quippy.dictionary_module.Dictionary')
 
+    entry_types = np.zeros(fdict.n, dtype='int32')
+    fdict.get_types(entry_types)
+
     arrays = {}
-    for i in range(1, fdict.n + 1):
+    for i, entry_type in enumerate(entry_types, 1):
         key = fdict.get_key(i)
         key = key.strip().decode('ascii')
-        # fixme: fails for non_array elements. Make universal: compatible with array or scalar content in dictionary
-        try:  # this is an unsufficient temporary fix
+        if key in skip_keys:
+            continue
+        if entry_type in _ARRAY_TYPES:
             value = f90wrap.runtime.get_array(f90wrap.runtime.sizeof_fortran_t,
                                               fdict._handle, _quippy.f90wrap_dictionary__array__, key)
-            arrays[key] = value.copy()
-        except ValueError:
-            value = fdict.get_value(key)
-            try:
-                # normally it is an tuple, because the error arf from fortran is converted to output
-                arrays[key] = cp(value[0])
-            except TypeError:
-                arrays[key] = cp(value)
+            arrays[key] = value.copy() if copy else value
+        elif entry_type in _SCALAR_GETTERS:
+            arrays[key] = get_scalar_value(fdict, key, entry_type)
 
     return arrays
 
 
+_ARRAY_TYPES = {quippy.dictionary_module.T_INTEGER_A, quippy.dictionary_module.T_REAL_A,
+                quippy.dictionary_module.T_COMPLEX_A, quippy.dictionary_module.T_LOGICAL_A,
+                quippy.dictionary_module.T_CHAR_A, quippy.dictionary_module.T_INTEGER_A2,
+                quippy.dictionary_module.T_REAL_A2}
+
+_SCALAR_GETTERS = {quippy.dictionary_module.T_INTEGER: 'f90wrap_dictionary_get_value_i',
+                   quippy.dictionary_module.T_REAL: 'f90wrap_dictionary_get_value_r',
+                   quippy.dictionary_module.T_COMPLEX: 'f90wrap_dictionary_get_value_c',
+                   quippy.dictionary_module.T_LOGICAL: 'f90wrap_dictionary_get_value_l',
+                   quippy.dictionary_module.T_CHAR: 'f90wrap_dictionary_get_value_s'}
+
+
+def get_scalar_value(fdict, key, entry_type):
+    """Gets the scalar entry `key` of type `entry_type` (one of the keys of _SCALAR_GETTERS)
+    from a quippy dictionary"""
+
+    # the getter returns the value and whether it was found
+    value, found = getattr(_quippy, _SCALAR_GETTERS[entry_type])(this=fdict._handle, key=key)
+    if not found:
+        raise KeyError(key)
+    if entry_type == quippy.dictionary_module.T_LOGICAL:
+        value = bool(value)
+    elif entry_type == quippy.dictionary_module.T_CHAR:
+        value = value.strip().decode('ascii') if isinstance(value, bytes) else value.strip()
+    return value
+
+
 def set_doc(doc, extra):
     def wrap(method):
         method.__doc__ = update_doc_string(doc, extra)
@@ -20,12 +20,19 @@
 # HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
 
 
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import weakref
+
 import quippy
 from ase import Atoms
 import numpy as np
 from ase.io.extxyz import key_val_dict_to_str
 
-__all__ = ['Descriptor']
+__all__ = ['Descriptor', 'read_descriptor_chunks']
 
 
 def convert_atoms_types_iterable_method(method):
@@ -34,20 +41,54 @@ def convert_atoms_types_iterable_method(method):
     to transparently iterate over a list of Atoms objects...
 
     Taken from py2 version
+
+    For an iterable of ASE Atoms objects, `n_jobs` larger than one distributes
+    them over a pool of that many processes, `chunksize` frames at a time, and
+    the results are returned in order.
     """
 
-    def wrapper(self, at, *args, **kw):
+    def wrapper(self, at, *args, n_jobs=None, chunksize=1, **kw):
         if isinstance(at, quippy.atoms_types_module.Atoms):
             return method(self, at, *args, **kw)
         elif isinstance(at, Atoms):
-            _quip_at = quippy.convert.ase_to_quip(at)
+            _quip_at = self._convert_ase_atoms(at)
             return method(self, _quip_at, *args, **kw)
+        elif n_jobs is not None and n_jobs > 1:
+            return self._map_processes(method.__name__, at, args, kw, n_jobs, chunksize)
         else:
             return [wrapper(self, atelement, *args, **kw) for atelement in at]
 
     return wrapper
 
 
+# descriptor of a worker process started by Descriptor._map_processes()
+_process_descriptor = None
+
+
+def _process_init(args_str):
+    global _process_descriptor
+    _process_descriptor = Descriptor(args_str)
+
+
+def _process_call(task):
+    method_name, at, args, kw = task
+    return getattr(_process_descriptor, method_name)(at, *args, **kw)
+
+
+def _geometry_key(numbers, positions, cell, pbc):
+    """Raw bytes of everything the connectivity of an Atoms object depends on, to be compared exactly"""
+    return tuple(np.ascontiguousarray(x).tobytes() for x in (numbers, positions, cell, pbc))
+
+
+def _frames_fingerprint(frames):
+    """SHA-256 digest of the geometries of a sequence of ASE Atoms objects, as stored by calc_to_disk()"""
+    digest = hashlib.sha256()
+    for at in frames:
+        for x in _geometry_key(at.numbers, at.positions, at.cell, at.pbc):
+            digest.update(x)
+    return digest.hexdigest()
+
+
 class Descriptor:
 
     def __init__(self, args_str=None, **init_kwargs):
@@ -71,6 +112,10 @@ class Descriptor:
 
         # intialise the wrapped object and hide it from the user
         self._quip_descriptor = quippy.descriptors_module.descriptor(args_str)
+        # kept to make the same descriptor in worker processes
+        self._args_str = args_str
+        # the last ASE Atoms object converted by _convert_ase_atoms(), as (weakref, geometry key, quippy Atoms)
+        self._last_conversion = (None, None, None)
 
         # kept for compatibility with older version
         # super convoluted though :D should just rethink it at some point
@@ -97,6 +142,41 @@ class Descriptor:
         # could be like get_cutoff()
         return self._quip_descriptor.cutoff()
 
+    def _convert_ase_atoms(self, at):
+        """
+        Converts an ASE Atoms object to quippy Atoms, reusing the result of the previous conversion
+        if it was of the same object with the same geometry.
+
+        This lets repeated calls of sizes(), count() and calc() work on the same quippy Atoms
+        object for a frame and so share its connectivity.
+        """
+
+        ase_ref, key, quip_at = self._last_conversion
+        new_key = _geometry_key(at.numbers, at.positions, at.cell, at.pbc)
+        if ase_ref is not None and ase_ref() is at and key == new_key:
+            return quip_at
+
+        quip_at = quippy.convert.ase_to_quip(at)
+        self._last_conversion = (weakref.ref(at), new_key, quip_at)
+        return quip_at
+
+    def _map_processes(self, method_name, frames, args, kw, n_jobs, chunksize):
+        """
+        Calls the method `method_name` on each of `frames` in a pool of `n_jobs` processes,
+        each with its own copy of this descriptor, and returns the results in order.
+        """
+
+        def tasks():
+            for at in frames:
+                if not isinstance(at, Atoms):
+                    raise TypeError('only ASE Atoms objects can be sent to worker processes, '
+                                    'not {}'.format(type(at)))
+                # copies leave out attached calculators, which cannot be pickled
+                yield method_name, at.copy(), args, kw
+
+        with multiprocessing.Pool(n_jobs, initializer=_process_init, initargs=(self._args_str,)) as pool:
+            return list(pool.imap(_process_call, tasks(), chunksize=chunksize))
+
     @convert_atoms_types_iterable_method
     def sizes(self, at, cutoff=None):
         """
@@ -136,8 +216,14 @@ class Descriptor:
             if at.cutoff < self.cutoff() + 1:
                 at.set_cutoff(self.cutoff() + 1)
 
-        # TODO: add logic to skip this if it has been calculated already for speedup
+        # skip the rebuild if the connectivity was calculated here before with the same cutoff and geometry,
+        # the state is kept on the atoms object so that it is shared by all descriptors
+        connect_state = (float(at.cutoff), _geometry_key(at.z, at.pos, at.lattice, at.is_periodic))
+        if getattr(at, '_descriptor_connect_state', None) == connect_state:
+            return
+
         at.calc_connect()
+        at._descriptor_connect_state = connect_state
 
     @convert_atoms_types_iterable_method
     def calc_descriptor(self, at, args_str=None, cutoff=None, **calc_kwargs):
@@ -146,6 +232,8 @@ class Descriptor:
         returns the array of descriptor values. Does not compute gradients; use
         calc(at, grad=True, ...) for that.
 
+        For a list of Atoms objects, n_jobs=N computes them in N worker processes.
+
         """
         try:
             return self.calc(at, False, args_str, cutoff, **calc_kwargs)['data']
@@ -153,7 +241,7 @@ class Descriptor:
             return []
 
     @convert_atoms_types_iterable_method
-    def calc(self, at, grad=False, args_str=None, cutoff=None, **calc_kwargs):
+    def calc(self, at, grad=False, args_str=None, cutoff=None, packed=False, **calc_kwargs):
         """
         Calculates all descriptors of this type in the Atoms object, and
         gradients if grad=True. Results can be accessed dictionary- or
@@ -163,6 +251,15 @@ class Descriptor:
         'grad_index_0based' contains indices to gradients (descriptor, atom).
         Cutoffs and gradients of cutoffs are also returned.
 
+        The atoms of descriptor `i` are 'ci'[ci_offsets[i]:ci_offsets[i+1]], and with
+        grad=True its gradients are 'grad_data'[grad_offsets[i]:grad_offsets[i+1]].
+        By default 'ii' and 'has_grad_data' are lists with an array per descriptor;
+        with packed=True they are single arrays indexed by 'grad_offsets' as well,
+        so that every entry of the result is one contiguous array.
+
+        For a list of Atoms objects, n_jobs=N computes them in N worker processes,
+        sending `chunksize` frames to a worker at a time.
+
         """
 
         # arg string and calc_args
@@ -173,51 +270,205 @@ class Descriptor:
             args_str += ' ' + key_val_dict_to_str(calc_kwargs)
 
         # calc connectivity on the atoms object with the internal one
-        self._calc_connect(at, cutoff)
+        n_descriptors, n_cross = self.sizes(at, cutoff)
 
         # descriptor calculation
         descriptor_out_raw = self._quip_descriptor.calc(at, do_descriptor=True, do_grad_descriptor=grad,
                                                         args_str=args_str)
 
-        # unpack to a list of dicts
-        count = self.count(at)
-        descriptor_out = dict()
-        for i in range(count):
-            # unpack to dict with the specific converter function
-            mono_dict = quippy.convert.descriptor_data_mono_to_dict(descriptor_out_raw.x[i])
-
-            # add to the result
-            for key, val in mono_dict.items():
-                if key in descriptor_out.keys():
-                    descriptor_out[key].append(val)
-                else:
-                    descriptor_out[key] = [val]
-
-        # make numpy arrays out of them
-        for key, val in descriptor_out.items():
-            # merge the arrays according to shape
-            if key in ['data', 'ci']:
-                descriptor_out[key] = np.concatenate(val, axis=0)
-            elif key in ['covariance_cutoff', 'has_data']:
-                descriptor_out[key] = np.array(val)
-            elif key in ["pos", "grad_covariance_cutoff"]:
-                # corresponds to the gradients
-                descriptor_out[key] = np.concatenate([x.T for x in val])
-            elif key == "grad_data":
-                descriptor_out[key] = np.transpose(np.concatenate(val, axis=2), axes=(2, 1, 0))
-
-        if "ii" in descriptor_out.keys():
-            grad_index_0based = []
-            for idx, ii_perdesc in enumerate(descriptor_out["ii"]):
-                for ii_item in ii_perdesc:
-                    grad_index_0based.append([descriptor_out["ci"][idx], ii_item])
-            # same as in py2, makes iteration of gradient easier
-            descriptor_out["grad_index_0based"] = np.array(grad_index_0based) - 1
-
-        if count > 0:
-            descriptor_out['data'] = descriptor_out['data'].reshape((count, -1))
-        else:
-            descriptor_out['data'] = np.array([[]])
-
         # This is a dictionary now and hence needs to be indexed as one, unlike the old version
+        return self._unpack_descriptor_data(descriptor_out_raw, n_descriptors, n_cross, grad, packed)
+
+    def calc_many(self, frames, grad=False, args_str=None, cutoff=None, n_jobs=None, chunksize=1,
+                  **calc_kwargs):
+        """
+        Calculates descriptors for a list or iterator of Atoms objects, and returns them
+        stacked over all frames, instead of as a list of dictionaries.
+
+        'data', 'covariance_cutoff' and 'has_data' are concatenated over the frames,
+        and the descriptors of frame `i` are `descriptor_offsets[i]:descriptor_offsets[i+1]`.
+        'ci' is indexed by 'ci_offsets' in the same way. If grad=True, 'grad_data',
+        'grad_covariance_cutoff', 'pos' and 'grad_index_0based' are indexed by
+        'grad_offsets'; the indices in 'grad_index_0based' are within each frame.
+        `n_jobs` and `chunksize` are passed on to calc().
+
+        """
+
+        per_frame = self.calc(list(frames), grad, args_str, cutoff, n_jobs=n_jobs, chunksize=chunksize,
+                              **calc_kwargs)
+
+        keys = ['data', 'covariance_cutoff', 'has_data', 'ci']
+        offset_keys = {'data': 'descriptor_offsets', 'ci': 'ci_offsets'}
+        if grad:
+            keys += ['grad_data', 'grad_covariance_cutoff', 'pos', 'grad_index_0based']
+            offset_keys['grad_data'] = 'grad_offsets'
+
+        # frames without any descriptors only have an empty 'data' entry, these stand in for the rest
+        empty = {'data': np.zeros((0, self.n_dim)), 'covariance_cutoff': np.zeros(0),
+                 'has_data': np.zeros(0, dtype=int), 'ci': np.zeros(0, dtype='int32'),
+                 'grad_data': np.zeros((0, 3, self.n_dim)), 'grad_covariance_cutoff': np.zeros((0, 3)),
+                 'pos': np.zeros((0, 3)), 'grad_index_0based': np.zeros((0, 2), dtype='int32')}
+
+        descriptor_out = {}
+        for key in keys:
+            values = [frame_out[key] if 'ci' in frame_out else empty[key] for frame_out in per_frame]
+            descriptor_out[key] = np.concatenate([empty[key]] + values)
+            if key in offset_keys:
+                descriptor_out[offset_keys[key]] = np.concatenate([[0], np.cumsum([len(value) for value in values],
+                                                                                  dtype=int)])
+
+        return descriptor_out
+
+    def calc_to_disk(self, frames, path, grad=False, frames_per_chunk=100, resume=True, args_str=None,
+                     cutoff=None, n_jobs=None, chunksize=1, **calc_kwargs):
+        """
+        Calculates descriptors for an iterator of Atoms objects (e.g. from ase.io.iread()) and
+        writes them to disk chunk by chunk, so the whole set never has to be held in memory.
+
+        Each chunk of `frames_per_chunk` frames is written with calc_many() to a subdirectory
+        of `path`, one .npy file per array, and the arrays can be memory-mapped with
+        read_descriptor_chunks(). The index `path/index.json` lists the chunks completed so far;
+        with resume=True an interrupted run picks up after the last of them, skipping as many
+        frames of `frames` as they hold. The index also records the descriptor, `grad`, the
+        calculation arguments, `cutoff` and a fingerprint of the geometries of the frames of
+        each chunk, and resuming with any of these changed raises a ValueError. Returns the index.
+
+        """
+
+        calc_args = ' '.join(filter(None, [args_str, key_val_dict_to_str(calc_kwargs)]))
+        settings = {'args_str': self._args_str, 'grad': grad, 'calc_args': calc_args,
+                    'cutoff': None if cutoff is None else float(cutoff)}
+
+        index_filename = os.path.join(path, 'index.json')
+        index = dict(settings, chunks=[], frame_offsets=[0], frame_fingerprints=[])
+        frames = iter(frames)
+
+        if resume and os.path.exists(index_filename):
+            with open(index_filename) as f:
+                previous = json.load(f)
+            for key, value in settings.items():
+                if previous.get(key) != value:
+                    raise ValueError('{} was written with {}={!r}, not {!r}'.format(path, key, previous.get(key),
+                                                                                    value))
+            # the frames already done are skipped, but must be those they were calculated for
+            for i, fingerprint in enumerate(previous['frame_fingerprints']):
+                n_frames = previous['frame_offsets'][i + 1] - previous['frame_offsets'][i]
+                if _frames_fingerprint(itertools.islice(frames, n_frames)) != fingerprint:
+                    raise ValueError('{}: the frames of {} are not those given'.format(path, previous['chunks'][i]))
+            index = previous
+        os.makedirs(path, exist_ok=True)
+
+        while True:
+            chunk_frames = list(itertools.islice(frames, frames_per_chunk))
+            if not chunk_frames:
+                break
+
+            descriptor_out = self.calc_many(chunk_frames, grad, args_str, cutoff, n_jobs=n_jobs,
+                                            chunksize=chunksize, **calc_kwargs)
+
+            chunk_name = 'chunk_{:06d}'.format(len(index['chunks']))
+            os.makedirs(os.path.join(path, chunk_name), exist_ok=True)
+            for key, value in descriptor_out.items():
+                np.save(os.path.join(path, chunk_name, key + '.npy'), value)
+
+            index['chunks'].append(chunk_name)
+            index['frame_offsets'].append(index['frame_offsets'][-1] + len(chunk_frames))
+            index['frame_fingerprints'].append(_frames_fingerprint(chunk_frames))
+
+            # the index is replaced only once the chunk is complete, so it never lists a partial one
+            with open(index_filename + '.tmp', 'w') as f:
+                json.dump(index, f)
+            os.replace(index_filename + '.tmp', index_filename)
+
+        return index
+
+    def _unpack_descriptor_data(self, descriptor_out_raw, n_descriptors, n_cross, grad, packed=False):
+        """
+        Transfers the contents of a `descriptor_data` object into contiguous arrays, in a single pass
+        over the descriptors, and returns them in the dictionary returned by calc().
+
+        The arrays are sized from `n_descriptors` and `n_cross`, as given by sizes(). Unless `packed`
+        is true, 'ii' and 'has_grad_data' are split into a list of per-descriptor views.
+        """
+
+        if n_descriptors == 0:
+            return {'data': np.array([[]])}
+
+        n_dim = self.n_dim
+        data = np.empty((n_descriptors, n_dim))
+        has_data = np.empty(n_descriptors, dtype=int)
+        covariance_cutoff = np.empty(n_descriptors)
+        ci = []
+        ci_offsets = np.zeros(n_descriptors + 1, dtype=int)
+        if grad:
+            has_grad_data = np.empty(n_cross, dtype=int)
+            grad_data = np.empty((n_cross, 3, n_dim))
+            grad_covariance_cutoff = np.empty((n_cross, 3))
+            pos = np.empty((n_cross, 3))
+            ii = np.empty(n_cross, dtype='int32')
+            grad_offsets = np.zeros(n_descriptors + 1, dtype=int)
+
+        for i in range(n_descriptors):
+            desc_data_mono = descriptor_out_raw.x[i]
+            data[i] = desc_data_mono.data
+            has_data[i] = desc_data_mono.has_data
+            covariance_cutoff[i] = desc_data_mono.covariance_cutoff
+            ci.append(desc_data_mono.ci)
+            ci_offsets[i + 1] = ci_offsets[i] + len(ci[-1])
+            if grad:
+                start = grad_offsets[i]
+                ii_i = desc_data_mono.ii
+                end = start + len(ii_i)
+                if end > n_cross:
+                    raise RuntimeError('Descriptor gradients do not fit into the size given by sizes()')
+                ii[start:end] = ii_i
+                has_grad_data[start:end] = desc_data_mono.has_grad_data
+                # Fortran shapes are (n_dim, 3, n_neighb), (3, n_neighb) and (3, n_neighb)
+                grad_data[start:end] = desc_data_mono.grad_data.T
+                grad_covariance_cutoff[start:end] = desc_data_mono.grad_covariance_cutoff.T
+                pos[start:end] = desc_data_mono.pos.T
+                grad_offsets[i + 1] = end
+
+        descriptor_out = {'data': data, 'has_data': has_data, 'covariance_cutoff': covariance_cutoff,
+                          'ci': np.concatenate(ci), 'ci_offsets': ci_offsets}
+
+        if grad:
+            n_grad = grad_offsets[-1]
+            descriptor_out.update({'grad_data': grad_data[:n_grad],
+                                   'grad_covariance_cutoff': grad_covariance_cutoff[:n_grad],
+                                   'pos': pos[:n_grad],
+                                   'grad_offsets': grad_offsets})
+            if packed:
+                descriptor_out.update({'has_grad_data': has_grad_data[:n_grad], 'ii': ii[:n_grad]})
+            else:
+                # per-descriptor views, as these are kept as lists
+                descriptor_out.update({'has_grad_data': np.split(has_grad_data[:n_grad], grad_offsets[1:-1]),
+                                       'ii': np.split(ii[:n_grad], grad_offsets[1:-1])})
+
+            # pairs of (ci, ii) for each gradient, same as in py2, makes iteration of gradient easier
+            n_neighb = np.diff(grad_offsets)
+            descriptor_out['grad_index_0based'] = np.stack(
+                [np.repeat(descriptor_out['ci'][:n_descriptors], n_neighb), ii[:n_grad]], axis=1) - 1
+
         return descriptor_out
+
+
+def read_descriptor_chunks(path, mmap_mode='r'):
+    """
+    Reads the chunks written by Descriptor.calc_to_disk() into `path`.
+
+    Returns a list with a dictionary for each chunk, as returned by calc_many() for its frames,
+    with the arrays memory-mapped according to `mmap_mode`. The frames of chunk `i` are
+    `frame_offsets[i]:frame_offsets[i+1]` of the index in `path/index.json`.
+    """
+
+    with open(os.path.join(path, 'index.json')) as f:
+        index = json.load(f)
+
+    chunks = []
+    for chunk_name in index['chunks']:
+        chunk_dir = os.path.join(path, chunk_name)
+        chunks.append({filename[:-len('.npy')]: np.load(os.path.join(chunk_dir, filename), mmap_mode=mmap_mode)
+                       for filename in sorted(os.listdir(chunk_dir)) if filename.endswith('.npy')})
+
+    return chunks
@@ -27,6 +27,7 @@ import numpy as np
 from quippy import dynamicalsystem_module
 import quippy.convert
 import quippy.atoms_types_module
+import quippy.potential
 
 import _quippy
 
@@ -87,12 +88,125 @@ _barostat_types = {
     'BAROSTAT_HOOVER_LANGEVIN': 1,
 }
 
-__all__ = ['Dynamics', 'DynamicalSystem']
+__all__ = ['Dynamics', 'DynamicalSystem', 'TrajectoryBuffer']
+
+
+class TrajectoryBuffer(object):
+    """
+    Ring buffer holding selected properties and params of the last `n_frames` snapshots of a quip Atoms object
+
+    Frames are added with `capture()`, which copies only the requested quantities into
+    arrays allocated on the first capture, so no Atoms objects are copied. Once `n_frames`
+    snapshots have been captured, each new one overwrites the oldest.
+
+    :param n_frames: number of snapshots kept
+
+    :param properties: names of per-atom properties to keep, e.g. 'pos', 'velo' and 'force'
+
+    :param params: names of params to keep, e.g. 'time' or 'energy'
+
+    :param filename: if given, the frames are held in a memory mapped ``.npy`` file
+                     of this name instead of in memory, and can be read back with
+                     ``numpy.load(filename, mmap_mode='r')``. As the file is a ring
+                     buffer, its frames are in chronological order only as long as
+                     no more than `n_frames` snapshots have been captured.
+
+    Values are in QUIP units and per-atom properties are transposed to the ASE layout,
+    e.g. ``buffer['pos']`` has shape ``(len(buffer), n_atoms, 3)``.
+    """
+
+    def __init__(self, n_frames, properties=('pos', 'velo', 'force'), params=('time',), filename=None):
+        if n_frames < 1:
+            raise ValueError('n_frames must be at least 1')
+        self.n_frames = n_frames
+        self.properties = list(properties)
+        self.params = list(params)
+        self.filename = filename
+        self.n_captured = 0
+        # structured array of n_frames records, made on the first capture when the shapes are known
+        self.data = None
+        self._param_getters = None
+
+    def _allocate(self, atoms):
+        fields = []
+        property_keys = [atoms.properties.get_key(i).strip().decode('ascii')
+                         for i in range(1, atoms.properties.n + 1)]
+        for name in self.properties:
+            if name not in property_keys:
+                raise ValueError('Atoms has no property %r to capture' % name)
+            value = self._get_array(atoms.properties, name)
+            fields.append((name, value.dtype, value.T.shape))
+
+        entry_types = np.zeros(atoms.params.n, dtype='int32')
+        atoms.params.get_types(entry_types)
+        keys = [atoms.params.get_key(i).strip().decode('ascii') for i in range(1, atoms.params.n + 1)]
+        self._param_getters = {}
+        for name in self.params:
+            entry_type = entry_types[keys.index(name)] if name in keys else None
+            if entry_type in quippy.convert._SCALAR_GETTERS:
+                self._param_getters[name] = (lambda atoms, name=name, entry_type=entry_type:
+                                             quippy.convert.get_scalar_value(atoms.params, name, entry_type))
+            elif entry_type in quippy.convert._ARRAY_TYPES:
+                self._param_getters[name] = lambda atoms, name=name: self._get_array(atoms.params, name).T
+            else:
+                raise ValueError('Atoms has no param %r to capture' % name)
+            value = np.asarray(self._param_getters[name](atoms))
+            fields.append((name, value.dtype, value.shape))
+
+        dtype = np.dtype(fields)
+        if self.filename is not None:
+            self.data = np.lib.format.open_memmap(self.filename, mode='w+', dtype=dtype, shape=(self.n_frames,))
+        else:
+            self.data = np.zeros(self.n_frames, dtype=dtype)
+
+    @staticmethod
+    def _get_array(fdict, name):
+        # a view of the Fortran storage, looked up each time as it may be reallocated
+        return f90wrap.runtime.get_array(f90wrap.runtime.sizeof_fortran_t, fdict._handle,
+                                         _quippy.f90wrap_dictionary__array__, name)
+
+    def capture(self, atoms):
+        """
+        Copy the selected properties and params of the quip Atoms object `atoms` into the next frame
+        """
+        if self.data is None:
+            self._allocate(atoms)
+        frame = self.data[self.n_captured % self.n_frames]
+        for name in self.properties:
+            frame[name] = self._get_array(atoms.properties, name).T
+        for name, getter in self._param_getters.items():
+            frame[name] = getter(atoms)
+        self.n_captured += 1
+
+    def __len__(self):
+        return min(self.n_captured, self.n_frames)
+
+    def __getitem__(self, name):
+        """
+        Frames of property or param `name` held in the buffer, oldest first
+        """
+        if self.data is None:
+            raise KeyError(name)
+        if self.n_captured <= self.n_frames:
+            return self.data[name][:self.n_captured]
+        return np.roll(self.data[name], -(self.n_captured % self.n_frames), axis=0)
+
+    def flush(self):
+        """
+        Write the frames to `filename`, for a buffer held in a memory mapped file
+        """
+        if isinstance(self.data, np.memmap):
+            self.data.flush()
 
 
 class DynamicalSystem(dynamicalsystem_module.DynamicalSystem):
     __doc__ = dynamicalsystem_module.DynamicalSystem.__doc__
 
+    def __init__(self, atoms_in, *args, **kwargs):
+        dynamicalsystem_module.DynamicalSystem.__init__(self, atoms_in, *args, **kwargs)
+        # the Fortran object is a shallow copy of atoms_in, which has to be finalised after it
+        self._atoms_in = atoms_in
+
     # def __init__(self, atoms_in, velocity=None, acceleration=None, constraints=None,
     #     restraints=None, rigidbodies=None, error=None, handle=None):
     #
@@ -106,12 +220,31 @@ class DynamicalSystem(dynamicalsystem_module.DynamicalSystem):
 
     def run(self, pot, dt, n_steps, summary_interval=None, hook_interval=None, write_interval=None,
             trajectory=None, args_str=None, hook=None,
-            save_interval=None):
+            save_interval=None, save_buffer=None):
+        """
+        Without a `hook`, snapshots are saved every `save_interval` steps and returned. By default
+        these are copies of the whole Atoms object. If `save_buffer` is given as a
+        :class:`TrajectoryBuffer`, only the quantities it selects are captured, and it is returned.
+        """
 
         if hook is None and hook_interval is not None:
             raise ValueError('hook_interval not permitted when hook is not present')
 
-        if hook is None:
+        if hook is not None and save_buffer is not None:
+            raise ValueError('save_buffer not permitted when hook is present')
+
+        if save_buffer is not None:
+            atoms = self.atoms
+            dynamicalsystem_module.DynamicalSystem.run(self, pot, dt, n_steps,
+                                                       lambda: save_buffer.capture(atoms),
+                                                       hook_interval=save_interval,
+                                                       summary_interval=summary_interval,
+                                                       write_interval=write_interval,
+                                                       trajectory=trajectory,
+                                                       args_str=args_str)
+            save_buffer.flush()
+            return save_buffer
+        elif hook is None:
             traj = []
             save_hook = lambda: traj.append(self.atoms.copy())
             dynamicalsystem_module.DynamicalSystem.run(self, pot, dt, n_steps,
@@ -171,7 +304,7 @@ class Dynamics(optimize.Dynamics):
         self.ase_atoms = atoms
 
         if not atoms.has('momenta'):  # so that there is a velocity initialisation on the quip object
-            atoms.set_momenta(np.zeros(len(atoms), 3))
+            atoms.set_momenta(np.zeros((len(atoms), 3)))
         self._quip_atoms = quippy.convert.ase_to_quip(self.ase_atoms)
 
         # add the mass separately, because converter is not doing it
@@ -180,7 +313,7 @@ class Dynamics(optimize.Dynamics):
 
         # initialise accelerations as zero, so that we have the objects in QUIP
         _quippy.f90wrap_atoms_add_property_real_2da(this=self._quip_atoms._handle, name='acc',
-                                                    value=np.zeros(len(atoms), 3))
+                                                    value=np.zeros((3, len(atoms)), order="F"))
 
         self._ds = DynamicalSystem(self._quip_atoms)
 
@@ -221,6 +354,14 @@ class Dynamics(optimize.Dynamics):
         self._calc_virial = False
         self._virial = np.zeros((3, 3))
 
+        # whether momenta and params of ase_atoms are up to date, see sync_ase_atoms()
+        self._ase_atoms_synced = True
+
+    def __del__(self):
+        # the positions of ase_atoms may be a view of the Fortran positions, which are freed with _quip_atoms
+        if hasattr(self, '_quip_atoms'):
+            self.ase_atoms.arrays['positions'] = self.ase_atoms.arrays['positions'].copy()
+
     def get_time(self):
         return float(self._ds.t * fs)
 
@@ -261,16 +402,79 @@ class Dynamics(optimize.Dynamics):
     def call_observers(self):
         for function, interval, args, kwargs in self.observers:
             if self._ds.nsteps % interval == 0:
+                self.sync_ase_atoms()
                 function(*args, **kwargs)
 
-    def step(self, forces):
+    def sync_ase_atoms(self):
+        """
+        Bring the momenta of `ase_atoms` and the status params of the quip Atoms up to date
+        after steps taken with `step(sync=False)`
+        """
+        if self._ase_atoms_synced:
+            return
+        self.ase_atoms.arrays['positions'] = self._quip_atoms.pos.T
+        self.ase_atoms.arrays['momenta'] = self.ase_atoms.get_masses()[:, np.newaxis] * \
+                                           quippy.convert.velocities_quip_to_ase(self._quip_atoms.velo)
+        self._update_params()
+        self._ase_atoms_synced = True
+
+    def _update_params(self):
+        # Copy status into atoms.params
+        # TODO: this would nee to go to the new observer, rigth?
+        quippy.convert.add_param_values(self._quip_atoms, {
+            'time': self._ds.t * fs,  # from fs to ASE time units
+            'nsteps': self._ds.nsteps,
+            'cur_temp': self._ds.cur_temp,
+            'avg_temp': self._ds.avg_temp,
+            'dW': self._ds.dw,
+            'work': self._ds.work,
+            'Epot': self._ds.epot,
+            'Ekin': self._ds.ekin,
+            'Wkin': self._ds.wkin,
+            'thermostat_dW': self._ds.thermostat_dw,
+            'thermostat_work': self._ds.thermostat_work})
+
+    def _fast_step(self, forces, sync):
+        """
+        step() without ASE constraints or virial
+
+        The positions of `ase_atoms` stay a view of the Fortran positions, and forces from a quippy
+        Potential are calculated without going through the ASE get_forces() machinery.
+        """
+        if self._ds.nsteps == 0:
+            self._quip_atoms.acc[:] = forces.T / self._quip_atoms.mass
+
+        self._ds.advance_verlet1(self._dt, virial=self._virial)
+        self.ase_atoms.arrays['positions'] = self._quip_atoms.pos.T
+        self._ase_atoms_synced = False
+
+        calc = self.ase_atoms.calc
+        if isinstance(calc, quippy.potential.Potential):
+            calc.calculate(self.ase_atoms, properties=['forces'], system_changes=['positions'])
+            forces = calc.results['forces'].copy()
+        else:
+            forces = self.ase_atoms.get_forces()
+
+        self._ds.advance_verlet2(self._dt, forces.T, virial=self._virial)
+        if sync:
+            self.sync_ase_atoms()
+        return forces
+
+    def step(self, forces, sync=True):
         """
         Advance dynamics by one time-step.
 
         Returns forces at the end of the time-step, suitable for passing to next step()
+
+        Without ASE constraints, barostats or NPT thermostats, the Fortran positions are
+        shared with `ase_atoms`. With `sync=False` its momenta and the status params are then
+        left to be updated by `sync_ase_atoms()`, which `run()` does only when observers are called.
         """
         # assert (self._ds.atoms.is_same_fortran_object(self._quip_atoms))
 
+        if not self.ase_atoms.constraints and not self._calc_virial:
+            return self._fast_step(forces, sync)
+
         # on entry we have r(t), v(t), p(t), f(t) in atoms and ds.atoms
 
         # keep a copy of r(t)
@@ -299,7 +503,7 @@ class Dynamics(optimize.Dynamics):
         if self.ase_atoms.constraints:
             # fixme: there are only ASE constraints, right? I assume so here
             # keep a copy of new positions r(t+dt) so we don't lose them
-            r_of_t_plus_dt = self._quip_atoms.get_positions()
+            r_of_t_plus_dt = self._quip_atoms.pos.T.copy()
 
             # manually revert positions of atoms to r(t)
             # NB: do not call set_positions() as this applies constraints
@@ -359,19 +563,8 @@ class Dynamics(optimize.Dynamics):
 
         # Now we have r(t+dt), v(t+dt), p(t+dt), a(t+dt) in atoms
 
-        # Copy status into atoms.params
-        # TODO: this would nee to go to the new observer, rigth?
-        self._quip_atoms.params['time'] = self._ds.t * fs  # from fs to ASE time units
-        self._quip_atoms.params['nsteps'] = self._ds.nsteps
-        self._quip_atoms.params['cur_temp'] = self._ds.cur_temp
-        self._quip_atoms.params['avg_temp'] = self._ds.avg_temp
-        self._quip_atoms.params['dW'] = self._ds.dw
-        self._quip_atoms.params['work'] = self._ds.work
-        self._quip_atoms.params['Epot'] = self._ds.epot
-        self._quip_atoms.params['Ekin'] = self._ds.ekin
-        self._quip_atoms.params['Wkin'] = self._ds.wkin
-        self._quip_atoms.params['thermostat_dW'] = self._ds.thermostat_dw
-        self._quip_atoms.params['thermostat_work'] = self._ds.thermostat_work
+        self._update_params()
+        self._ase_atoms_synced = True
 
         # return f(t+dt)
         return forces
@@ -380,10 +573,11 @@ class Dynamics(optimize.Dynamics):
         """
         Run dynamics forwards for `steps` steps.
         """
-        f = self._quip_atoms.get_forces()
+        f = self.ase_atoms.get_forces()
         for step in range(steps):
-            f = self.step(f)
+            f = self.step(f, sync=False)
             self.call_observers()
+        self.sync_ase_atoms()
 
     def print_status(self, file=None):
         self._ds.print_status(self.loglabel, file=file)
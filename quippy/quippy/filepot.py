@@ -0,0 +1,139 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Portions of this code were written by
+# HQ X     James Kermode
+# HQ X
+# HQ X   Copyright 2019
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   https://warwick.ac.uk/fac/sci/eng/staff/jrk
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+"""
+Driver side of the persistent FilePot protocol, for writing FilePot drivers in
+Python. With ``persistent=T`` FilePot starts its command once and keeps it
+running, and for each calculation sends two messages down the driver's standard
+input, the calc args_str and the structure in extended XYZ format. The driver
+replies on its standard output with a single extended XYZ message holding the
+results. Each message is preceded by its length in bytes, as an 8 byte integer
+in native byte order.
+
+A minimal driver looks like::
+
+    from ase.calculators.emt import EMT
+    from quippy.filepot import serve, ase_calculate
+
+    serve(ase_calculate(EMT()))
+
+and is used from QUIP with ``Potential('FilePot command="python driver.py" persistent=T')``.
+Anything else the driver prints must go to standard error.
+"""
+
+import io
+import struct
+import sys
+
+import ase.io
+import numpy as np
+from ase.atoms import Atoms
+
+__all__ = ['read_message', 'write_message', 'serve', 'ase_calculate']
+
+MSG_LEN = struct.Struct('=q')
+
+
+def read_message(stream):
+    """
+    Read one length-prefixed message from binary `stream`. Returns None at end of file.
+    """
+    header = stream.read(MSG_LEN.size)
+    if len(header) == 0:
+        return None
+    if len(header) != MSG_LEN.size:
+        raise IOError('truncated message header {!r}'.format(header))
+    length, = MSG_LEN.unpack(header)
+    if length < 0:
+        raise IOError('invalid message length {}'.format(length))
+    data = stream.read(length)
+    if len(data) != length:
+        raise IOError('truncated message: expected {} bytes, got {}'.format(length, len(data)))
+    return data
+
+
+def write_message(stream, data):
+    """
+    Write `data` (bytes) to binary `stream` as one length-prefixed message.
+    """
+    stream.write(MSG_LEN.pack(len(data)))
+    stream.write(data)
+    stream.flush()
+
+
+def serve(calculate, stdin=None, stdout=None):
+    """
+    Answer FilePot requests until `stdin` is closed.
+
+    Parameters
+    ----------
+    calculate : callable
+        Called as ``calculate(atoms, args_str)`` for each request, and returns a dict
+        with any of the keys ``energy``, ``forces``, ``virial`` and ``local_e``.
+    stdin, stdout : binary streams, optional
+        Default to the binary buffers of `sys.stdin` and `sys.stdout`.
+    """
+    stdin = stdin if stdin is not None else sys.stdin.buffer
+    stdout = stdout if stdout is not None else sys.stdout.buffer
+
+    while True:
+        args_str = read_message(stdin)
+        if args_str is None:
+            break
+        data = read_message(stdin)
+        if data is None:
+            raise IOError('end of file while waiting for atoms')
+        atoms = ase.io.read(io.StringIO(data.decode()), format='extxyz')
+        results = calculate(atoms, args_str.decode())
+
+        out = Atoms(numbers=atoms.numbers, positions=atoms.positions, cell=atoms.cell, pbc=atoms.pbc)
+        if 'energy' in results:
+            out.info['energy'] = float(results['energy'])
+        if 'virial' in results:
+            out.info['virial'] = np.asarray(results['virial'], dtype=float).reshape(3, 3)
+        if 'forces' in results:
+            out.arrays['force'] = np.asarray(results['forces'], dtype=float)
+        if 'local_e' in results:
+            out.arrays['local_e'] = np.asarray(results['local_e'], dtype=float)
+
+        buffer = io.StringIO()
+        ase.io.write(buffer, out, format='extxyz')
+        write_message(stdout, buffer.getvalue().encode())
+
+
+def ase_calculate(calc, properties=('energy', 'forces', 'virial')):
+    """
+    Make a `calculate` function for :func:`serve` from the ASE calculator `calc`.
+
+    The virial is computed from the stress, so it is only available for periodic systems.
+    """
+    def calculate(atoms, args_str):
+        atoms.calc = calc
+        results = {}
+        if 'energy' in properties:
+            results['energy'] = atoms.get_potential_energy()
+        if 'forces' in properties:
+            results['forces'] = atoms.get_forces()
+        if 'virial' in properties and atoms.pbc.all():
+            results['virial'] = -atoms.get_stress(voigt=False) * atoms.get_volume()
+        return results
+
+    return calculate
@@ -24,6 +24,10 @@ ASE-compatible Calculator from a quip-potential object
 
 """
 
+import collections.abc
+import ctypes
+import multiprocessing
+import traceback
 from copy import deepcopy as cp
 
 import ase
@@ -60,6 +64,20 @@ class Potential(ase.calculators.calculator.Calculator):
         mpi_obj=None
         callback=None
         finalise=True
+
+    reuse_quip_atoms: bool
+        Keep the Fortran Atoms object alive between calls to calculate().
+        Guided by `system_changes`, only positions (and the cell, if it
+        changed) are pushed into it, so its Connection object survives and
+        can be updated rather than rebuilt. A new Fortran Atoms object is
+        still made when the number of atoms, the atomic numbers or the
+        periodic boundary conditions change, and when `add_arrays` or
+        `add_info` are in use.
+    cutoff_skin: float
+        Sets `cutoff_skin` on the Fortran Atoms object, so that
+        `calc_connect()` only does a full neighbour list rebuild once an
+        atom has moved more than half of this distance, and recalculates
+        distances otherwise. Most useful with `reuse_quip_atoms=True`.
     """)
     def __init__(self, args_str="",
                  pot1=None, pot2=None,
@@ -67,7 +85,8 @@ class Potential(ase.calculators.calculator.Calculator):
                  param_filename=None,
                  atoms=None,
                  calculation_always_required=False, calc_args=None,
-                 add_arrays=None, add_info=None, **kwargs):
+                 add_arrays=None, add_info=None, reuse_quip_atoms=False,
+                 cutoff_skin=None, **kwargs):
         quippy.potential_module.Potential.__init__.__doc__
 
         self._default_properties = ['energy', 'forces']
@@ -75,6 +94,12 @@ class Potential(ase.calculators.calculator.Calculator):
 
         ase.calculators.calculator.Calculator.__init__(self, restart=None, ignore_bad_restart_file=False, label=None,
                                                        atoms=atoms, **kwargs)
+        # arguments to make an equivalent potential in another process, see calc_many()
+        self._init_kwargs = None
+        if pot1 is None or pot2 is None:
+            self._init_kwargs = dict(args_str=args_str, param_str=param_str, param_filename=param_filename,
+                                     calc_args=calc_args, add_arrays=add_arrays, add_info=add_info)
+
         # init the quip potential
         if param_filename is not None and isinstance(param_filename, str):
             # from a param filename
@@ -93,6 +118,12 @@ class Potential(ase.calculators.calculator.Calculator):
 
         # init the quip atoms as None, to have the variable
         self._quip_atoms = None
+        self.reuse_quip_atoms = reuse_quip_atoms
+        self.cutoff_skin = cutoff_skin
+        # keys of the properties and params put in by the conversion, anything else is an output of calc()
+        self._quip_input_keys = None
+        # Fortran-ordered arrays which receive the results of calc(), see _output_arg()
+        self._output_buffers = {}
         # init the info and array keys that need to be added when converting atoms objects
         self.add_arrays = add_arrays
         self.add_info = add_info
@@ -109,7 +140,7 @@ class Potential(ase.calculators.calculator.Calculator):
         
         # storage of non-standard results
         self.extra_results = {'config': {},
-                              'atoms': {}}
+                              'atoms': _LazyArrays()}
 
     @set_doc(quippy.potential_module.Potential.calc.__doc__,
     """
@@ -158,7 +189,14 @@ class Potential(ase.calculators.calculator.Calculator):
     Additional keyword arguments are appended to `calc_args`.
     
     Non-standard calculation results (such as `gap_local_variance`) are stored in 
-    `self.extra_results`.
+    `self.extra_results`. Per-atom ones in `self.extra_results['atoms']` are only
+    copied out of the Fortran Atoms object when first read, those not read before
+    the next calculation are dropped.
+
+    Forces, virials, local energies and local virials are written by Fortran
+    directly into buffers owned by the calculator, which are reused between
+    calculations. `self.results` and `self.extra_results` hold copies of these,
+    so they are not changed by later calculations.
     
     """)
     def calculate(self, atoms=None, properties=None, system_changes=None,
@@ -217,14 +255,17 @@ class Potential(ase.calculators.calculator.Calculator):
         # call the base class method, which updates self.atoms to atoms
         ase.calculators.calculator.Calculator.calculate(self, atoms, properties, system_changes)
 
+        # per-atom results of the previous calculation that were not read are views of the Fortran storage,
+        # which is about to be changed
+        self.extra_results['atoms'].invalidate()
         self.extra_results = {'config': {},
-                              'atoms': {}} # reset all extra results on each new calculation       
+                              'atoms': _LazyArrays()} # reset all extra results on each new calculation
 
         # construct the quip atoms object which we will use to calculate on
         # if add_arrays/add_info given to this object is not None, then OVERWRITES the value set in __init__
-        self._quip_atoms = quippy.convert.ase_to_quip(self.atoms,
-                                                      add_arrays=add_arrays if add_arrays is not None else self.add_arrays,
-                                                      add_info=add_info if add_info is not None else self.add_info)
+        self._update_quip_atoms(system_changes,
+                                add_arrays=add_arrays if add_arrays is not None else self.add_arrays,
+                                add_info=add_info if add_info is not None else self.add_info)
 
         # constructing args_string with automatically aliasing the calculateable non-quippy properties
         # calc_args string to be passed to Fortran code
@@ -238,14 +279,17 @@ class Potential(ase.calculators.calculator.Calculator):
 
         args_str += ' energy'
         # no need to add logic to energy, it is calculated anyways (returned when potential called)
+        # other results are written by Fortran straight into buffers owned by this calculator, apart from
+        # those for which arrays were given, which are kept in the Fortran Atoms object as before
+        n_atoms = len(self.atoms)
         if 'virial' in properties or 'stress' in properties:
-            args_str += ' virial'
+            args_str += self._output_arg('virial', (3, 3), _dict_args)
         if 'local_virial' in properties or 'stresses' in properties:
-            args_str += ' local_virial'
+            args_str += self._output_arg('local_virial', (9, n_atoms), _dict_args)
         if 'energies' in properties or 'local_energy' in properties:
-            args_str += ' local_energy'
+            args_str += self._output_arg('local_energy', (n_atoms,), _dict_args)
         if 'forces' in properties:
-            args_str += ' force'
+            args_str += self._output_arg('force', (3, n_atoms), _dict_args)
         # TODO: implement 'elastic_constants', 'unrelaxed_elastic_constants', 'numeric_forces'
 
         # fixme: workaround to get the calculated energy, because the wrapped dictionary is not handling that float well
@@ -255,9 +299,20 @@ class Potential(ase.calculators.calculator.Calculator):
         # print('Calling QUIP Potential.calc() with args_str "{}"'.format(args_str))
         self._quip_potential.calc(self._quip_atoms, args_str=args_str, energy=ener_dummy, **_dict_args)
 
-        # retrieve data from _quip_atoms.properties and _quip_atoms.params
-        _quip_properties = quippy.convert.get_dict_arrays(self._quip_atoms.properties)
+        # retrieve data from _quip_atoms.properties and _quip_atoms.params, leaving out the inputs
+        _input_keys = ['Z', 'pos', 'species', 'map_shift', 'n_neighb', 'velo']
+        _quip_properties = quippy.convert.get_dict_arrays(self._quip_atoms.properties, skip_keys=_input_keys,
+                                                          copy=False)
         _quip_params = quippy.convert.get_dict_arrays(self._quip_atoms.params)
+        for key in ['force', 'local_energy', 'local_virial', 'virial']:
+            # both the output buffers and the Fortran storage are overwritten by the next calculation
+            if key in _dict_args and _dict_args[key] is self._output_buffers.get(key):
+                if key == 'virial':
+                    _quip_params[key] = _dict_args[key].copy()
+                else:
+                    _quip_properties[key] = _dict_args[key].copy()
+            elif key in _quip_properties:
+                _quip_properties[key] = _quip_properties[key].copy()
 
         self.results['energy'] = ener_dummy[0]
         self.results['free_energy'] = self.results['energy']
@@ -265,21 +320,21 @@ class Potential(ase.calculators.calculator.Calculator):
         # process potential output to ase.properties
         # not handling energy here, because that is always returned by the potential above
         if 'virial' in _quip_params.keys():
-            stress = -_quip_params['virial'].copy() / self.atoms.get_volume()
+            stress = -_quip_params['virial'] / self.atoms.get_volume()
             # convert to 6-element array in Voigt order
             self.results['stress'] = np.array([stress[0, 0], stress[1, 1], stress[2, 2],
                                                stress[1, 2], stress[0, 2], stress[0, 1]])
             self.extra_results['config']['virial'] = _quip_params['virial'].copy()
 
         if 'force' in _quip_properties.keys():
-            self.results['forces'] = np.copy(_quip_properties['force'].T)
+            self.results['forces'] = _quip_properties['force'].T
 
         if 'local_energy' in _quip_properties.keys():
-            self.results['energies'] = np.copy(_quip_properties['local_energy'])
-            self.extra_results['atoms']['local_energy'] = np.copy(_quip_properties['local_energy'])
+            self.results['energies'] = _quip_properties['local_energy']
+            self.extra_results['atoms']['local_energy'] = _quip_properties['local_energy']
 
         if 'local_virial' in _quip_properties.keys():
-            self.extra_results['atoms']['local_virial'] = np.copy(_quip_properties['local_virial'])
+            self.extra_results['atoms']['local_virial'] = _quip_properties['local_virial']
 
         if 'stresses' in properties:
             # use the correct atomic volume
@@ -298,8 +353,8 @@ class Potential(ase.calculators.calculator.Calculator):
             else:
                 # just use average
                 _v_atom = self.atoms.get_volume() / self._quip_atoms.n
-            self.results['stresses'] = -np.copy(_quip_properties['local_virial']).T.reshape((self._quip_atoms.n, 3, 3),
-                                                                                            order='F') / _v_atom
+            self.results['stresses'] = -_quip_properties['local_virial'].T.reshape((self._quip_atoms.n, 3, 3),
+                                                                                   order='F') / _v_atom
 
         # all non-standard results now go in self.extra_results
         _skip_keys = set(list(self.results.keys()) + ['Z', 'pos', 'species',
@@ -311,11 +366,176 @@ class Potential(ase.calculators.calculator.Calculator):
             if param not in _skip_keys:
                 self.extra_results['config'][param] = cp(val)
 
-        # any other arrays (per-atom properties)
+        # any other arrays (per-atom properties), copied out of the Fortran storage only when read
         for prop, val in _quip_properties.items():
             if prop not in _skip_keys:
-                # transpose before copying because of setting `order=C` here; issue#151
-                self.extra_results['atoms'][prop] = np.copy(val.T, order='C')
+                self.extra_results['atoms'].add_fortran_array(prop, val)
+
+    def calc_many(self, frames, properties=None, n_workers=None, chunksize=1, calc_args=None):
+        """
+        Evaluate a sequence of configurations, returning the results as stacked arrays
+
+        frames: iterable of ase.atoms.Atoms
+            Configurations to evaluate, may be a generator such as `ase.io.iread()`.
+        properties: list of str
+            Any of 'energy', 'forces', 'stress', 'virial' and 'energies',
+            by default the properties returned by `get_default_properties()`.
+        n_workers: int
+            If given and larger than one, frames are distributed over a pool of
+            this many processes, each holding its own copy of the Fortran potential.
+            Not available for potentials made from `pot1` and `pot2`.
+        chunksize: int
+            Number of frames sent to a worker process at a time.
+        calc_args: str or dict
+            Passed on to `calculate()` for every frame.
+
+        Returns a dictionary with 'energy' and 'virial' of shapes `(n_frames,)`
+        and `(n_frames, 3, 3)`, 'stress' in Voigt order, and per-atom 'forces'
+        and 'energies' concatenated over all frames. These are indexed by
+        'offsets', of shape `(n_frames + 1,)`: the atoms of frame `i` are
+        `offsets[i]:offsets[i+1]`.
+
+        Without worker processes, this calculator is used directly and is
+        left holding the results of the last frame.
+        """
+
+        if properties is None:
+            properties = self.get_default_properties()
+        for prop in properties:
+            if prop not in _calc_many_properties:
+                raise RuntimeError("calc_many() can't calculate property '%s'" % prop)
+
+        if n_workers is not None and n_workers > 1:
+            if self._init_kwargs is None:
+                raise ValueError('calc_many() cannot use worker processes for a potential made from pot1 and pot2')
+            with multiprocessing.Pool(n_workers, initializer=_calc_many_init,
+                                      initargs=(self._init_kwargs,)) as pool:
+                frame_results = list(pool.imap(_calc_many_frame,
+                                               # copies leave out attached calculators, which cannot be pickled
+                                               ((frame.copy(), properties, calc_args) for frame in frames),
+                                               chunksize=chunksize))
+        else:
+            frame_results = [_calc_frame(self, frame, properties, calc_args) for frame in frames]
+
+        n_atoms = [result['n_atoms'] for result in frame_results]
+        results = {'offsets': np.concatenate([[0], np.cumsum(n_atoms, dtype=int)])}
+        for prop in properties:
+            values = [result[prop] for result in frame_results]
+            if prop in ['forces', 'energies']:
+                results[prop] = np.concatenate(values) if values else np.zeros((0, 3) if prop == 'forces' else 0)
+            else:
+                results[prop] = np.array(values)
+
+        return results
+
+    def set_callback(self, callback):
+        """
+        Make a 'CallbackPot' potential call the Python function `callback` to do its calculations
+
+        `callback(Z, lattice, positions, results, args_str)` evaluates a batch of configurations
+        of the same atoms at once. The arrays are NumPy views of the Fortran storage:
+
+        Z: `(n_atoms,)` atomic numbers
+        lattice: `(n_configs, 3, 3)` cells, with the lattice vectors as rows like `Atoms.cell`
+        positions: `(n_configs, n_atoms, 3)` positions
+        results: dict of the arrays to fill in place, holding the requested ones of
+            'energy' `(n_configs,)`, 'forces' `(n_configs, n_atoms, 3)`, 'virial' `(n_configs, 3, 3)`,
+            'local_energy' `(n_configs, n_atoms)` and 'local_virial' `(n_configs, n_atoms, 9)`
+        args_str: the calc args string
+
+        Finite difference forces and virials (`force_using_fd`, `virial_using_fd`) are evaluated
+        with one call per `batch_size` displaced configurations, where `batch_size` is an init
+        argument of the potential, e.g. `Potential('CallbackPot batch_size=128')`. Exceptions
+        raised by `callback` are printed and make the Fortran calculation fail.
+        """
+
+        def batch_callback(n_configs, n_atoms, flags, Z, lattice, pos, energy, force, virial,
+                           local_e, local_virial, args_str, args_len):
+            try:
+                results = {}
+                for flag, (name, ptr, shape) in enumerate([('energy', energy, (n_configs,)),
+                                                           ('forces', force, (n_configs, n_atoms, 3)),
+                                                           ('virial', virial, (n_configs, 3, 3)),
+                                                           ('local_energy', local_e, (n_configs, n_atoms)),
+                                                           ('local_virial', local_virial, (n_configs, n_atoms, 9))]):
+                    if flags & (1 << flag):
+                        results[name] = np.ctypeslib.as_array(ptr, shape)
+                callback(np.ctypeslib.as_array(Z, (n_atoms,)),
+                         np.ctypeslib.as_array(lattice, (n_configs, 3, 3)),
+                         np.ctypeslib.as_array(pos, (n_configs, n_atoms, 3)),
+                         results, ctypes.string_at(args_str, args_len).decode())
+            except Exception:
+                traceback.print_exc()
+                return 1
+            return 0
+
+        # keep a reference, the function pointer is only valid while this object is alive
+        self._batch_callback = _BATCH_CALLBACK_TYPE(batch_callback)
+        self._quip_potential.set_batch_callback(ctypes.cast(self._batch_callback, ctypes.c_void_p).value)
+
+    def _output_arg(self, name, shape, dict_args):
+        """
+        Arrange for the result `name` to be written into a Fortran-ordered buffer owned by this calculator
+
+        The buffer is added to `dict_args` and reused between calls while its shape stays the same. If an
+        array was given for this result already, the args_str entry to request it is returned instead.
+        """
+
+        if name in dict_args:
+            return ' ' + name
+
+        buffer = self._output_buffers.get(name)
+        if buffer is None or buffer.shape != shape:
+            buffer = np.zeros(shape, order='F')
+            self._output_buffers[name] = buffer
+        dict_args[name] = buffer
+        return ''
+
+    def _update_quip_atoms(self, system_changes=None, add_arrays=None, add_info=None):
+        """
+        Bring `self._quip_atoms` in line with `self.atoms`
+
+        Without `reuse_quip_atoms` a new Fortran Atoms object is made on each call. Otherwise the previous one
+        is updated in place where `system_changes` allows it, after removing the results of the last calculation.
+        """
+
+        if system_changes is None:
+            system_changes = ase.calculators.calculator.all_changes
+
+        # extra arrays and info are not tracked by system_changes and cannot be overwritten in place
+        if (not self.reuse_quip_atoms or self._quip_atoms is None or self._quip_input_keys is None
+                or add_arrays is not None or add_info is not None
+                or len(self.atoms) != self._quip_atoms.n
+                or self.atoms.has('momenta') != ('velo' in self._quip_input_keys[0])
+                or 'numbers' in system_changes or 'pbc' in system_changes):
+            self._quip_atoms = quippy.convert.ase_to_quip(self.atoms, add_arrays=add_arrays, add_info=add_info)
+            if self.cutoff_skin is not None:
+                self._quip_atoms.cutoff_skin = self.cutoff_skin
+            if self.reuse_quip_atoms:
+                self._quip_input_keys = (set(_dict_keys(self._quip_atoms.properties)),
+                                         set(_dict_keys(self._quip_atoms.params)))
+            return
+
+        # drop the results of the previous calculation, so that nothing stale is picked up afterwards,
+        # but keep the properties maintained by calc_connect() along with the Connection itself
+        property_keys, param_keys = self._quip_input_keys
+        for key in _dict_keys(self._quip_atoms.properties):
+            if key not in property_keys and key not in ('map_shift', 'n_neighb'):
+                self._quip_atoms.remove_property(key)
+        for key in _dict_keys(self._quip_atoms.params):
+            if key not in param_keys:
+                self._quip_atoms.params.remove_value(key)
+        self._quip_atoms.repoint()
+
+        if 'cell' in system_changes:
+            self._quip_atoms.set_lattice(self.atoms.get_cell().T.copy(), scale_positions=False)
+            # set_lattice() guesses periodicity from the lattice vectors, restore the ASE value
+            self._quip_atoms.is_periodic[:] = self.atoms.get_pbc()
+        if 'positions' in system_changes:
+            self._quip_atoms.pos[:] = self.atoms.get_positions().T
+
+        if self.atoms.has('momenta'):
+            self._quip_atoms.velo[:] = quippy.convert.velocities_ase_to_quip(self.atoms.get_velocities())
 
     def get_virial(self, atoms=None):
         self.get_stress(atoms)
@@ -343,6 +563,101 @@ class Potential(ase.calculators.calculator.Calculator):
         self._default_properties = properties[:]
 
 
+class _LazyArrays(collections.abc.MutableMapping):
+    """
+    Dictionary of per-atom results, which takes arrays out of the Fortran storage of a quip Atoms object
+    only when they are first read
+
+    The arrays are transposed and copied to C order then; issue#151.
+    """
+
+    def __init__(self):
+        self._arrays = {}
+        self._fortran_arrays = {}
+
+    def add_fortran_array(self, key, value):
+        """Adds a view `value` of a Fortran property, to be copied on first access"""
+        self._arrays.pop(key, None)
+        self._fortran_arrays[key] = value
+
+    def invalidate(self):
+        """Drops the Fortran views not read yet, must be called before their storage is changed or freed"""
+        self._fortran_arrays.clear()
+
+    def __getitem__(self, key):
+        if key in self._fortran_arrays:
+            self._arrays[key] = np.copy(self._fortran_arrays.pop(key).T, order='C')
+        return self._arrays[key]
+
+    def __setitem__(self, key, value):
+        self._fortran_arrays.pop(key, None)
+        self._arrays[key] = value
+
+    def __delitem__(self, key):
+        if key in self._fortran_arrays:
+            del self._fortran_arrays[key]
+        else:
+            del self._arrays[key]
+
+    def __contains__(self, key):
+        # without taking the array out of the Fortran storage, as __getitem__() would
+        return key in self._arrays or key in self._fortran_arrays
+
+    def __iter__(self):
+        return iter(list(self._arrays) + list(self._fortran_arrays))
+
+    def __len__(self):
+        return len(self._arrays) + len(self._fortran_arrays)
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__, list(self))
+
+
+# properties available from calc_many()
+_calc_many_properties = ['energy', 'forces', 'stress', 'virial', 'energies']
+
+# C interface of a CallbackPot batch callback, see callbackpot_batch_sub in CallbackPot.f95
+_double_p = ctypes.POINTER(ctypes.c_double)
+_BATCH_CALLBACK_TYPE = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                                        ctypes.POINTER(ctypes.c_int), _double_p, _double_p, _double_p, _double_p,
+                                        _double_p, _double_p, _double_p, ctypes.c_void_p, ctypes.c_int)
+
+# potential of a calc_many() worker process
+_calc_many_potential = None
+
+
+def _calc_frame(pot, atoms, properties, calc_args):
+    """Evaluate a single frame for calc_many(), returning copies of the results"""
+
+    calc_properties = ['stress' if prop == 'virial' else prop for prop in properties]
+    pot.calculate(atoms, properties=calc_properties, system_changes=ase.calculators.calculator.all_changes,
+                  calc_args=calc_args)
+
+    result = {'n_atoms': len(atoms)}
+    for prop in properties:
+        if prop == 'virial':
+            result[prop] = pot.extra_results['config']['virial'].copy()
+        else:
+            result[prop] = np.copy(pot.results[prop])
+    return result
+
+
+def _calc_many_init(init_kwargs):
+    """Make the potential of a calc_many() worker process"""
+
+    global _calc_many_potential
+    _calc_many_potential = Potential(calculation_always_required=True, **init_kwargs)
+
+
+def _calc_many_frame(args):
+    return _calc_frame(_calc_many_potential, *args)
+
+
+def _dict_keys(fdict):
+    """Keys of a quippy Dictionary, as a list of str"""
+    return [fdict.get_key(i).strip().decode('ascii') for i in range(1, fdict.n + 1)]
+
+
 def _check_arg(arg):
     """Checks if the argument is True bool or string meaning True"""
 
@@ -0,0 +1,309 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Portions of this code were written by
+# HQ X     James Kermode
+# HQ X
+# HQ X   Copyright 2019
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   https://warwick.ac.uk/fac/sci/eng/staff/jrk
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+"""
+Reference asyncio server for SocketPot clients.
+
+One server can serve many QUIP processes at once, each connecting with its own
+``client_id``. Both SocketPot protocols are supported:
+
+- extended XYZ (the default): the client sends the structure with request code
+  ``Y`` and then connects again with request code ``X`` to collect the results.
+- packed binary (``binary=T``): a single connection with request code ``B``
+  carries the request and the reply. See SocketPot.f95 for the message layout.
+
+Every connection starts with an 8 byte identification, the request code
+followed by the client ID formatted as ``%7d``. Messages are preceded by their
+length, as 8 ASCII characters in the XYZ protocol and as an 8 byte integer in the
+binary one, and the server ends each exchange with ``done.``.
+
+Calculations are done by a ``calculate(atoms, args_str)`` callable that returns a
+dict with any of ``energy``, ``forces``, ``virial``, ``local_e`` and ``local_virial``,
+for example one made by :func:`quippy.filepot.ase_calculate`::
+
+    from ase.calculators.emt import EMT
+    from quippy.filepot import ase_calculate
+    from quippy.socketserver import serve
+
+    serve(ase_calculate(EMT()), port=8888)
+"""
+
+import asyncio
+import io
+import logging
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import ase.io
+import numpy as np
+from ase.atoms import Atoms
+
+__all__ = ['SocketPotServer', 'serve', 'pack_binary_request', 'unpack_binary_request',
+           'pack_binary_reply', 'unpack_binary_reply']
+
+logger = logging.getLogger(__name__)
+
+MSG_LEN_SIZE = 8
+MSG_END_MARKER = b'done.'
+BINARY_MSG_LEN = struct.Struct('=q')
+
+FLAG_ENERGY = 1
+FLAG_FORCE = 2
+FLAG_VIRIAL = 4
+FLAG_LOCAL_E = 8
+FLAG_LOCAL_VIRIAL = 16
+
+
+def pack_binary_request(atoms, label, flags=FLAG_ENERGY | FLAG_FORCE | FLAG_VIRIAL, args_str=''):
+    """
+    Pack `atoms` into a binary SocketPot request, as sent by the Fortran client.
+    """
+    args = args_str.encode()
+    pbc = sum(1 << i for i in range(3) if atoms.pbc[i])
+    header = np.array([len(atoms), label, flags, pbc, len(args)], dtype=np.int32)
+    return b''.join([header.tobytes(),
+                     np.asarray(atoms.cell, dtype=np.float64).tobytes(),  # rows of cell are columns of lattice
+                     np.ascontiguousarray(atoms.positions, dtype=np.float64).tobytes(),
+                     np.asarray(atoms.numbers, dtype=np.int32).tobytes(),
+                     args])
+
+
+def unpack_binary_request(data):
+    """
+    Unpack a binary SocketPot request. Returns ``(atoms, label, flags, args_str)``.
+    """
+    n_atoms, label, flags, pbc, args_len = np.frombuffer(data, dtype=np.int32, count=5)
+    offset = 20
+    cell = np.frombuffer(data, dtype=np.float64, count=9, offset=offset).reshape(3, 3)
+    offset += 9 * 8
+    positions = np.frombuffer(data, dtype=np.float64, count=3 * n_atoms, offset=offset).reshape(n_atoms, 3)
+    offset += 3 * n_atoms * 8
+    numbers = np.frombuffer(data, dtype=np.int32, count=n_atoms, offset=offset)
+    offset += n_atoms * 4
+    args_str = data[offset:offset + args_len].decode()
+    atoms = Atoms(numbers=numbers, positions=positions, cell=cell, pbc=[bool(pbc & (1 << i)) for i in range(3)])
+    return atoms, int(label), int(flags), args_str
+
+
+def pack_binary_reply(n_atoms, label, results):
+    """
+    Pack the `results` dict for `n_atoms` atoms into a binary SocketPot reply.
+    """
+    flags = 0
+    arrays = [np.zeros(10)]
+    if 'energy' in results:
+        flags |= FLAG_ENERGY
+        arrays[0][0] = results['energy']
+    if 'virial' in results:
+        flags |= FLAG_VIRIAL
+        arrays[0][1:] = np.asarray(results['virial'], dtype=np.float64).reshape(3, 3).ravel(order='F')
+    if 'forces' in results:
+        flags |= FLAG_FORCE
+        arrays.append(np.asarray(results['forces'], dtype=np.float64).reshape(n_atoms, 3))
+    if 'local_e' in results:
+        flags |= FLAG_LOCAL_E
+        arrays.append(np.asarray(results['local_e'], dtype=np.float64).reshape(n_atoms))
+    if 'local_virial' in results:
+        flags |= FLAG_LOCAL_VIRIAL
+        local_virial = np.asarray(results['local_virial'], dtype=np.float64).reshape(n_atoms, 3, 3)
+        arrays.append(local_virial.transpose(0, 2, 1).reshape(n_atoms, 9))
+    header = np.array([n_atoms, label, flags, 0], dtype=np.int32)
+    return header.tobytes() + b''.join(np.ascontiguousarray(a).tobytes() for a in arrays)
+
+
+def unpack_binary_reply(data):
+    """
+    Unpack a binary SocketPot reply. Returns ``(label, results)``.
+    """
+    n_atoms, label, flags, _ = np.frombuffer(data, dtype=np.int32, count=4)
+    values = np.frombuffer(data, dtype=np.float64, offset=16)
+    results = {}
+    if flags & FLAG_ENERGY:
+        results['energy'] = values[0]
+    if flags & FLAG_VIRIAL:
+        results['virial'] = values[1:10].reshape(3, 3, order='F')
+    offset = 10
+    if flags & FLAG_FORCE:
+        results['forces'] = values[offset:offset + 3 * n_atoms].reshape(n_atoms, 3)
+        offset += 3 * n_atoms
+    if flags & FLAG_LOCAL_E:
+        results['local_e'] = values[offset:offset + n_atoms]
+        offset += n_atoms
+    if flags & FLAG_LOCAL_VIRIAL:
+        results['local_virial'] = values[offset:offset + 9 * n_atoms].reshape(n_atoms, 3, 3).transpose(0, 2, 1)
+    return int(label), results
+
+
+def _xyz_reply(atoms, label, results):
+    out = Atoms(numbers=atoms.numbers, positions=atoms.positions, cell=atoms.cell, pbc=atoms.pbc)
+    out.info['label'] = label
+    if 'energy' in results:
+        out.info['energy'] = float(results['energy'])
+    if 'virial' in results:
+        out.info['virial'] = np.asarray(results['virial'], dtype=float).reshape(3, 3)
+    if 'forces' in results:
+        out.arrays['force'] = np.asarray(results['forces'], dtype=float)
+    if 'local_e' in results:
+        out.arrays['local_e'] = np.asarray(results['local_e'], dtype=float)
+    buffer = io.StringIO()
+    ase.io.write(buffer, out, format='extxyz')
+    return buffer.getvalue().encode()
+
+
+class SocketPotServer(object):
+    """
+    asyncio server answering SocketPot requests from any number of clients.
+
+    Parameters
+    ----------
+    calculate : callable
+        ``calculate(atoms, args_str)`` returning a dict of results.
+    host, port : str, int
+        Address to listen on. With ``port=0`` a free port is chosen, available
+        as the `port` attribute once the server has started.
+    max_workers : int
+        Number of calculations run at the same time, in a thread pool. The
+        default of 1 is safe for calculators that are not thread safe.
+    """
+
+    def __init__(self, calculate, host='127.0.0.1', port=0, max_workers=1):
+        self.calculate = calculate
+        self.host = host
+        self.port = port
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._pending = {}  # client_id -> Future giving the XYZ reply
+        self._server = None
+        self._loop = None
+        self._thread = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info('SocketPotServer listening on %s:%d', self.host, self.port)
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start_in_thread(self):
+        """
+        Run the server in a daemon thread with its own event loop. Returns once it is listening.
+        """
+        started = threading.Event()
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start())
+            started.set()
+            loop.run_forever()
+            loop.close()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        started.wait()
+
+    def close(self):
+        if self._server is not None:
+            if self._thread is not None:
+                self._loop.call_soon_threadsafe(self._server.close)
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join()
+                self._thread = None
+            else:
+                self._server.close()
+        self._executor.shutdown(wait=False)
+
+    async def _run(self, *args):
+        return await self._loop.run_in_executor(self._executor, *args)
+
+    async def _handle(self, reader, writer):
+        try:
+            ident = (await reader.readexactly(MSG_LEN_SIZE)).decode()
+            code, client_id = ident[0], int(ident[1:])
+            if code == 'B':
+                data = await self._read_binary_message(reader)
+                reply = await self._run(self._binary_calc, data)
+                await self._write_binary_message(writer, reply)
+            elif code == 'Y':
+                data = await self._read_message(reader)
+                self._pending[client_id] = asyncio.ensure_future(self._run(self._xyz_calc, data))
+                writer.write(MSG_END_MARKER)
+                await writer.drain()
+            elif code == 'X':
+                if client_id not in self._pending:
+                    raise ValueError('no configuration received from client {}'.format(client_id))
+                reply = await self._pending.pop(client_id)
+                await self._write_message(writer, reply)
+            else:
+                raise ValueError('unsupported request code {!r}'.format(code))
+        except Exception:
+            logger.exception('SocketPotServer: error handling request')
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_message(reader):
+        length = int(await reader.readexactly(MSG_LEN_SIZE))
+        return await reader.readexactly(length)
+
+    @staticmethod
+    async def _write_message(writer, data):
+        writer.write(b'%8d' % len(data))
+        writer.write(data)
+        writer.write(MSG_END_MARKER)
+        await writer.drain()
+
+    @staticmethod
+    async def _read_binary_message(reader):
+        length, = BINARY_MSG_LEN.unpack(await reader.readexactly(BINARY_MSG_LEN.size))
+        if length < 0:
+            raise ValueError('invalid message length {}'.format(length))
+        return await reader.readexactly(length)
+
+    @staticmethod
+    async def _write_binary_message(writer, data):
+        writer.write(BINARY_MSG_LEN.pack(len(data)))
+        writer.write(data)
+        writer.write(MSG_END_MARKER)
+        await writer.drain()
+
+    def _binary_calc(self, data):
+        atoms, label, flags, args_str = unpack_binary_request(data)
+        results = self.calculate(atoms, args_str)
+        return pack_binary_reply(len(atoms), label + 1, results)
+
+    def _xyz_calc(self, data):
+        atoms = ase.io.read(io.StringIO(data.decode()), format='extxyz')
+        results = self.calculate(atoms, atoms.info.get('calc_args_str', ''))
+        return _xyz_reply(atoms, int(atoms.info['label']) + 1, results)
+
+
+def serve(calculate, host='127.0.0.1', port=0, max_workers=1):
+    """
+    Run a :class:`SocketPotServer` until interrupted.
+    """
+    server = SocketPotServer(calculate, host, port, max_workers)
+    asyncio.run(server.serve_forever())
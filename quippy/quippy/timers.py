@@ -0,0 +1,99 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Portions of this code were written by
+# HQ X     James Kermode
+# HQ X
+# HQ X   Copyright 2019
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   https://warwick.ac.uk/fac/sci/eng/staff/jrk
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+"""
+Access to the statistics accumulated by ``system_timer()`` in libAtoms. Regions
+timed with ``system_timer()`` (e.g. ``calc_connect`` or ``IPModel_GAP_Calc_gp_predict``)
+are recorded in a tree, with the number of calls, total wall clock and CPU times,
+and the shortest and longest wall clock time of each.
+
+Timing is off by default::
+
+    from quippy import timers
+
+    timers.enable_timers()
+    ...  # run calculations
+    print(timers.timers_to_json(indent=2))
+    timers.reset_timers()
+"""
+
+import json
+
+import quippy
+
+__all__ = ['enable_timers', 'disable_timers', 'reset_timers', 'get_timers', 'timers_to_json']
+
+
+def enable_timers(print_timers=False):
+    """
+    Switches on ``system_timer()``. Unless `print_timers` is true, the timers only
+    accumulate their statistics and do not print a TIMER line each time they stop.
+    """
+    quippy.system_module.enable_timing(do_print=print_timers)
+
+
+def disable_timers():
+    """Switches off ``system_timer()``, keeping the statistics accumulated so far."""
+    quippy.system_module.disable_timing()
+
+
+def reset_timers():
+    """Clears the statistics accumulated by ``system_timer()``."""
+    quippy.system_module.system_timer_reset()
+
+
+def get_timers():
+    """
+    Returns the statistics accumulated by ``system_timer()`` as nested dictionaries,
+    mapping the names of the top level regions to dictionaries with the keys
+    'n_calls', 'wall_total', 'cpu_total', 'wall_mean', 'wall_min', 'wall_max' and
+    'children', the latter mapping the names of the regions timed within to
+    dictionaries of the same form. Times are in seconds. For regions timed inside
+    OpenMP parallel regions the totals are summed over threads. Regions which have
+    not been called since the last reset_timers() are left out.
+    """
+    system_module = quippy.system_module
+    nodes = {0: {'children': {}}}
+    for i in range(1, system_module.system_timer_n_records() + 1):
+        (name, parent, n_calls, wall_total, cpu_total,
+         wall_min, wall_max) = system_module.system_timer_get_record(i)
+        if isinstance(name, bytes):
+            name = name.decode()
+        node = {'n_calls': int(n_calls), 'wall_total': float(wall_total), 'cpu_total': float(cpu_total),
+                'wall_mean': float(wall_total) / n_calls if n_calls > 0 else 0.0,
+                'wall_min': float(wall_min), 'wall_max': float(wall_max), 'children': {}}
+        # parents always come before their children
+        nodes[parent]['children'][name.strip()] = node
+        nodes[i] = node
+
+    def prune(children):
+        for name in list(children):
+            prune(children[name]['children'])
+            if children[name]['n_calls'] == 0 and not children[name]['children']:
+                del children[name]
+        return children
+
+    return prune(nodes[0]['children'])
+
+
+def timers_to_json(**json_kwargs):
+    """Returns get_timers() as a JSON string. Keyword arguments are passed on to json.dumps()."""
+    return json.dumps(get_timers(), **json_kwargs)
@@ -499,3 +499,21 @@ void quippy_error_abort_int_handler(int signum)
   quippy_error_abort_(message, strlen(message));
 }
 
+// Python callbacks may call other wrapped routines, or finalise wrapped objects, each of which
+// sets environment_buffer for itself. It is saved before such a callback and restored afterwards,
+// so that errors raised once the callback has returned still reach the routine called from Python.
+
+void *quippy_save_abort_environment(void)
+{
+  void *saved = malloc(sizeof(jmp_buf));
+  if (saved != NULL) memcpy(saved, environment_buffer, sizeof(jmp_buf));
+  return saved;
+}
+
+void quippy_restore_abort_environment(void *saved)
+{
+  if (saved == NULL) return;
+  memcpy(environment_buffer, saved, sizeof(jmp_buf));
+  free(saved);
+}
+
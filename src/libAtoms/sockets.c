@@ -5,9 +5,14 @@
 #include <stdio.h>
 #include <string.h>
 #include <stdlib.h>
+#include <stdint.h>
+#include <limits.h>
 #include <unistd.h>
 #include <errno.h>
 #include <arpa/inet.h> 
+#include <fcntl.h>
+#include <signal.h>
+#include <sys/wait.h>
 
 #define MSG_LEN_SIZE 8
 #define MSG_END_MARKER "done."
@@ -195,3 +200,247 @@ int quip_send_data(char *ip, int port, int client_id, char *request_code, char *
     close(sockfd);
     return 0;
 }
+
+/* Persistent child processes, connected via a pair of pipes to their standard
+   input and output. Messages in both directions are framed by their length, a
+   64-bit integer in native byte order, followed by the data itself. */
+
+int quip_pipe_open(char *command, int *pid, int *write_fd, int *read_fd)
+{
+    int to_child[2], from_child[2];
+
+    if (pipe(to_child) < 0) {
+      printf("Could not create pipes, errno=%d\n", errno);
+      return 1;
+    }
+    if (pipe(from_child) < 0) {
+      printf("Could not create pipes, errno=%d\n", errno);
+      close(to_child[0]); close(to_child[1]);
+      return 1;
+    }
+
+    if ((*pid = fork()) < 0) {
+      printf("Could not fork, errno=%d\n", errno);
+      close(to_child[0]); close(to_child[1]);
+      close(from_child[0]); close(from_child[1]);
+      return 1;
+    }
+
+    if (*pid == 0) {
+      /* child: connect stdin and stdout to the pipes and run the command */
+      dup2(to_child[0], STDIN_FILENO);
+      dup2(from_child[1], STDOUT_FILENO);
+      close(to_child[0]); close(to_child[1]);
+      close(from_child[0]); close(from_child[1]);
+      execl("/bin/sh", "sh", "-c", command, (char *)NULL);
+      _exit(127);
+    }
+
+    close(to_child[0]);
+    close(from_child[1]);
+    /* don't let any other processes we start inherit our ends of the pipes */
+    fcntl(to_child[1], F_SETFD, FD_CLOEXEC);
+    fcntl(from_child[0], F_SETFD, FD_CLOEXEC);
+    *write_fd = to_child[1];
+    *read_fd = from_child[0];
+    return 0;
+}
+
+/* Messages over the pipes to a persistent FilePot driver are preceded by their
+   length as a 64 bit integer in native byte order. */
+
+int quip_pipe_send(int fd, char *data, int data_len)
+{
+    int64_t msg_len = data_len;
+    int sent, totalsent;
+    void (*old_handler)(int);
+
+    /* a driver that has died should give an error, not kill us with SIGPIPE */
+    old_handler = signal(SIGPIPE, SIG_IGN);
+
+    totalsent = 0;
+    while (totalsent < (int)sizeof(msg_len)) {
+      sent = write(fd, (char *)&msg_len+totalsent, sizeof(msg_len)-totalsent);
+      if (sent <= 0) {
+	printf("pipe broken while sending data_len\n");
+	signal(SIGPIPE, old_handler);
+	return 1;
+      }
+      totalsent += sent;
+    }
+
+    totalsent = 0;
+    while (totalsent < data_len) {
+      sent = write(fd, data+totalsent, data_len-totalsent);
+      if (sent <= 0) {
+	printf("pipe broken while sending data\n");
+	signal(SIGPIPE, old_handler);
+	return 1;
+      }
+      totalsent += sent;
+    }
+
+    signal(SIGPIPE, old_handler);
+    return 0;
+}
+
+int quip_pipe_recv_len(int fd, int *data_len)
+{
+    int64_t msg_len;
+    int received, totalreceived;
+
+    totalreceived = 0;
+    while (totalreceived < (int)sizeof(msg_len)) {
+      received = read(fd, (char *)&msg_len+totalreceived, sizeof(msg_len)-totalreceived);
+      if (received <= 0) {
+	printf("pipe broken while reading length\n");
+	return 1;
+      }
+      totalreceived += received;
+    }
+    if (msg_len < 0 || msg_len > INT_MAX) {
+      printf("invalid message length %lld read from pipe\n", (long long)msg_len);
+      return 1;
+    }
+    *data_len = (int)msg_len;
+    return 0;
+}
+
+int quip_pipe_recv(int fd, char *data, int data_len)
+{
+    int received, totalreceived;
+
+    totalreceived = 0;
+    while (totalreceived < data_len) {
+      received = read(fd, data+totalreceived, data_len-totalreceived);
+      if (received <= 0) {
+	printf("pipe broken while reading data\n");
+	return 1;
+      }
+      totalreceived += received;
+    }
+    return 0;
+}
+
+int quip_pipe_close(int pid, int write_fd, int read_fd)
+{
+    int status;
+
+    /* the child sees end of file on its standard input, and should exit */
+    close(write_fd);
+    close(read_fd);
+    if (waitpid(pid, &status, 0) < 0) return 1;
+    return (WIFEXITED(status) && WEXITSTATUS(status) == 0) ? 0 : 1;
+}
+
+/* Single round trip used by the binary SocketPot protocol: connect, identify
+   ourselves, send a message and receive the reply on the same connection. Both
+   are preceded by their length as a 64 bit integer in native byte order. The
+   reply buffer is allocated here to whatever size the server announces, and
+   must be released with quip_free_data(). */
+
+static int quip_send_all(int sockfd, char *data, int data_len)
+{
+    int sent, totalsent = 0;
+
+    while (totalsent < data_len) {
+      sent = send(sockfd, data+totalsent, data_len-totalsent, 0);
+      if (sent <= 0) return 1;
+      totalsent += sent;
+    }
+    return 0;
+}
+
+static int quip_recv_all(int sockfd, char *data, int data_len)
+{
+    int received, totalreceived = 0;
+
+    while (totalreceived < data_len) {
+      received = recv(sockfd, data+totalreceived, data_len-totalreceived, 0);
+      if (received <= 0) return 1;
+      totalreceived += received;
+    }
+    return 0;
+}
+
+int quip_exchange_data(char *ip, int port, int client_id, char *request_code, char *data, int data_len,
+		       char **reply, int *reply_len)
+{
+    int sockfd, status;
+    char id_str[MSG_LEN_SIZE+1], marker[MSG_END_MARKER_SIZE+1];
+    int64_t msg_len;
+    struct sockaddr_in serv_addr;
+
+    *reply = NULL;
+    *reply_len = 0;
+
+    if((sockfd = socket(AF_INET, SOCK_STREAM, 0)) < 0)
+    {
+        printf("Could not create socket \n");
+        return 1;
+    }
+
+    memset(&serv_addr, 0, sizeof(serv_addr));
+    serv_addr.sin_family = AF_INET;
+    serv_addr.sin_port = htons(port);
+
+    if(inet_pton(AF_INET, ip, &serv_addr.sin_addr)<=0)
+    {
+        printf("\n inet_pton error occured\n");
+        close(sockfd);
+        return 1;
+    }
+
+    if((status = connect(sockfd, (struct sockaddr *)&serv_addr, sizeof(serv_addr))) < 0)
+    {
+       printf("Connect Failed status=%d, errno=%d \n", status, errno);
+       close(sockfd);
+       return 1;
+    }
+
+    /* identify ourselves, then send the length of the data and the data itself */
+    sprintf(id_str, "%c%7d", *request_code, client_id);
+    msg_len = data_len;
+    if (quip_send_all(sockfd, id_str, MSG_LEN_SIZE) ||
+	quip_send_all(sockfd, (char *)&msg_len, sizeof(msg_len)) ||
+	quip_send_all(sockfd, data, data_len)) {
+      printf("socket connection broken while sending data\n");
+      close(sockfd);
+      return 1;
+    }
+
+    /* receive the length of the reply, the reply, and the end marker */
+    if (quip_recv_all(sockfd, (char *)&msg_len, sizeof(msg_len))) {
+      printf("socket connection broken while reading length\n");
+      close(sockfd);
+      return 1;
+    }
+    if (msg_len < 0 || msg_len > INT_MAX) {
+      printf("invalid reply length %lld\n", (long long)msg_len);
+      close(sockfd);
+      return 1;
+    }
+    *reply_len = (int)msg_len;
+    if ((*reply = malloc(*reply_len > 0 ? *reply_len : 1)) == NULL) {
+      printf("could not allocate %d bytes for reply\n", *reply_len);
+      close(sockfd);
+      return 1;
+    }
+    memset(marker, 0, sizeof(marker));
+    if (quip_recv_all(sockfd, *reply, *reply_len) ||
+	quip_recv_all(sockfd, marker, MSG_END_MARKER_SIZE)) {
+      printf("socket connection broken while reading data\n");
+      free(*reply);
+      *reply = NULL;
+      close(sockfd);
+      return 1;
+    }
+
+    close(sockfd);
+    return 0;
+}
+
+void quip_free_data(char *data)
+{
+    free(data);
+}
@@ -0,0 +1,58 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2019
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+"""
+Per-call cost of quippy.convert.ase_to_quip() making a new quip Atoms object,
+compared to updating an existing one in place after the positions have moved.
+
+    python benchmark_convert.py
+"""
+
+import timeit
+
+import ase.build
+import numpy as np
+import quippy
+
+
+def time_per_call(stmt, n_atoms):
+    # at least 10 calls, and about 10^6 atoms in total
+    number = max(10, 10 ** 6 // n_atoms)
+    return min(timeit.repeat(stmt, number=number, repeat=3)) / number
+
+
+def main():
+    print('{:>8} {:>14} {:>14}'.format('n_atoms', 'new (ms)', 'in place (ms)'))
+    for n_atoms in [10, 1000, 100000]:
+        at = ase.build.bulk('Cu', cubic=True).repeat((int(np.ceil((n_atoms / 4) ** (1. / 3.))),) * 3)[:n_atoms]
+        at.set_velocities(np.random.normal(size=(len(at), 3)))
+        at_quip = quippy.convert.ase_to_quip(at)
+
+        def new():
+            quippy.convert.ase_to_quip(at)
+
+        def in_place():
+            at.positions[0, 0] += 1e-6
+            quippy.convert.ase_to_quip(at, quip_atoms=at_quip)
+
+        print('{:8d} {:14.4f} {:14.4f}'.format(n_atoms, 1e3 * time_per_call(new, n_atoms),
+                                               1e3 * time_per_call(in_place, n_atoms)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2019
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+"""
+Per-step overhead of quippy.dynamicalsystem.Dynamics on top of the force calculation, for
+Dynamics.run() with the shared positions and deferred syncing, and for steps which go
+through the full ASE path because a (do-nothing) ASE constraint is present.
+
+    python benchmark_dynamics_step.py
+"""
+
+import timeit
+
+import ase.build
+import numpy as np
+from ase.constraints import FixAtoms
+from ase.units import fs
+from quippy.dynamicalsystem import Dynamics
+from quippy.potential import Potential
+
+sw_params = """
+<SW_params n_types="1" label="PRB_31">
+<per_type_data type="1" atomic_num="14" />
+<per_pair_data atnum_i="14" atnum_j="14" AA="7.049556277" BB="0.6022245584"
+p="4" q="0" a="1.80" sigma="2.0951" eps="2.1675" />
+<per_triplet_data atnum_c="14" atnum_j="14" atnum_k="14"
+lambda="21.0" gamma="1.20" eps="2.1675" />
+</SW_params>
+"""
+
+
+def make_dynamics(n_repeat, constraint):
+    at = ase.build.bulk('Si', cubic=True) * ((n_repeat,) * 3)
+    at.rattle(0.01, seed=0)
+    at.set_momenta(np.zeros((len(at), 3)))
+    if constraint:
+        at.set_constraint(FixAtoms([]))
+    at.calc = Potential('IP SW', param_str=sw_params, reuse_quip_atoms=True)
+    return Dynamics(at, 1.0 * fs, trajectory=None, logfile=None)
+
+
+def time_per_step(stmt, number):
+    return min(timeit.repeat(lambda: stmt(number), number=1, repeat=3)) / number
+
+
+def main():
+    print('{:>8} {:>12} {:>14} {:>14}'.format('n_atoms', 'force (ms)', 'fast over (ms)', 'full over (ms)'))
+    for n_repeat in [1, 4, 10]:
+        fast = make_dynamics(n_repeat, constraint=False)
+        full = make_dynamics(n_repeat, constraint=True)
+        at = fast.ase_atoms
+        number = max(5, 20000 // len(at))
+
+        def force(number):
+            for i in range(number):
+                at.positions[0, 0] += 1e-6
+                at.calc.calculate(at, properties=['forces'], system_changes=['positions'])
+
+        t_force = time_per_step(force, number)
+        t_fast = time_per_step(fast.run, number)
+        t_full = time_per_step(full.run, number)
+        print('{:8d} {:12.4f} {:14.4f} {:14.4f}'.format(len(at), 1e3 * t_force, 1e3 * (t_fast - t_force),
+                                                         1e3 * (t_full - t_force)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2019
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+"""
+Thread scaling of the OpenMP parallel interatomic potentials. Each potential
+is evaluated in a fresh process for each system size and each value of
+OMP_NUM_THREADS, and the energies and forces are checked against the single
+threaded results.
+
+    python benchmark_ip_openmp.py [--max-threads N] [--sizes 10000,100000,1000000] [--potentials ZBL,Tersoff]
+
+Sizes are target numbers of atoms, the supercells used are the nearest cubic
+repeats of each structure. Potentials which fail, e.g. because they are not
+available in this build (Brenner_2002 needs mdcore), are reported and skipped.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import timeit
+
+import ase.build
+import numpy as np
+
+PARAMS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'share', 'Parameters')
+
+# (init_args, parameter file or XML string, structure)
+POTENTIALS = [('IP Tersoff', 'ip.parms.Tersoff.xml', lambda: ase.build.bulk('Si', cubic=True)),
+              ('IP Brenner label=Brenner1', 'ip.parms.Brenner.xml', lambda: ase.build.bulk('C', cubic=True)),
+              ('IP Brenner_2002', 'ip.parms.Brenner_2002.xml', lambda: ase.build.bulk('C', cubic=True)),
+              ('IP LJ', 'ip.parms.LJ.xml', lambda: ase.build.bulk('Cu', cubic=True)),
+              ('IP Morse', 'ip.parms.Morse.CoSb3_CompMatSci_44.xml',
+               lambda: ase.build.bulk('Co', 'fcc', a=3.55, cubic=True)),
+              ('IP ZBL cutoff=4.0 cutoff_width=1.0', '<ZBL_params />', lambda: ase.build.bulk('Si', cubic=True))]
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+
+
+def repeat_for_size(structure, n_atoms):
+    """Number of repeats of `structure` along each cell vector giving close to `n_atoms` atoms"""
+    return max(1, int(round((n_atoms / len(structure())) ** (1.0 / 3.0))))
+
+
+def run(index, repeat, output):
+    from quippy.potential import Potential
+
+    init_args, params, structure = POTENTIALS[index]
+    at = structure().repeat(repeat)
+    at.rattle(0.05, seed=1)
+    # some parameter files hold several parameter sets, selected by label
+    if not params.startswith('<'):
+        with open(os.path.join(PARAMS_DIR, params)) as f:
+            params = f.read()
+    at.calc = Potential(init_args, param_str='<params>' + params + '</params>')
+
+    def calc():
+        at.positions[0, 0] += 1e-6
+        at.get_forces()
+
+    # the first call includes building the neighbour list from scratch
+    calc()
+    seconds = min(timeit.repeat(calc, number=1, repeat=3))
+    np.save(output, np.r_[seconds, at.get_potential_energy(), at.get_forces().ravel()])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--max-threads', type=int, default=os.cpu_count())
+    parser.add_argument('--sizes', default=','.join(str(n) for n in DEFAULT_SIZES),
+                        help='comma separated target numbers of atoms')
+    parser.add_argument('--potentials', default=None,
+                        help='comma separated names of potentials to run, e.g. ZBL,Tersoff (default: all)')
+    args = parser.parse_args()
+
+    sizes = [int(n) for n in args.sizes.split(',')]
+    potentials = list(enumerate(POTENTIALS))
+    if args.potentials is not None:
+        names = args.potentials.split(',')
+        potentials = [(index, pot) for (index, pot) in potentials if pot[0].split()[1] in names]
+    threads = [1]
+    while threads[-1] * 2 <= args.max_threads:
+        threads.append(threads[-1] * 2)
+
+    print('{:>36} {:>8} '.format('potential', 'n_atoms') + ' '.join('{:>9}'.format('%d thr' % n) for n in threads))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for index, (init_args, _, structure) in potentials:
+            for size in sizes:
+                repeat = repeat_for_size(structure, size)
+                n_atoms = len(structure()) * repeat ** 3
+                results = []
+                for n in threads:
+                    env = dict(os.environ, OMP_NUM_THREADS=str(n))
+                    output = os.path.join(tmpdir, 'result.npy')
+                    process = subprocess.run([sys.executable, __file__, '--run', str(index), str(repeat), output],
+                                             env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+                    if process.returncode != 0:
+                        # the exception, leaving out anything printed by finalisers afterwards
+                        error = process.stderr.decode().split('Exception ignored')[0].strip().splitlines()
+                        break
+                    results.append(np.load(output))
+                    # energies are summed in a different order, so compare them relative to their size
+                    assert np.isclose(results[-1][1], results[0][1], rtol=1e-10, atol=1e-8)
+                    assert np.allclose(results[-1][2:], results[0][2:], rtol=0.0, atol=1e-8)
+                if not results:
+                    print('{:>36} {:>8} failed: {}'.format(init_args, '', error[-1] if error else ''))
+                    break
+                print('{:>36} {:8d} '.format(init_args, n_atoms) +
+                      ' '.join('{:9.2f}'.format(1e3 * r[0]) for r in results) + '  ms')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--run':
+        run(int(sys.argv[2]), int(sys.argv[3]), sys.argv[4])
+    else:
+        main()
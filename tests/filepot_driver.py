@@ -0,0 +1,32 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2019
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+"""
+Stand-in persistent FilePot driver used by test_filepot.py: a Lennard-Jones
+calculator from ASE behind quippy.filepot.serve().
+"""
+
+import os
+import sys
+
+from ase.calculators.lj import LennardJones
+from quippy.filepot import serve, ase_calculate
+
+# report our process ID on stderr, stdout is reserved for results
+sys.stderr.write('filepot_driver.py pid {}\n'.format(os.getpid()))
+serve(ase_calculate(LennardJones(sigma=2.0, epsilon=1.0, rc=5.0)))
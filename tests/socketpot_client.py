@@ -0,0 +1,57 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2019
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+"""
+SocketPot client used by test_socketpot.py, so that several clients can talk
+to the server at the same time. Usage:
+
+    socketpot_client.py PORT CLIENT_ID BINARY N_STEPS OUTPUT
+
+Moves the first atom of a rattled silicon supercell N_STEPS times, and writes
+the energies, forces and stresses returned by the server as JSON to OUTPUT.
+"""
+
+import json
+import sys
+
+import ase.build
+
+from quippy.potential import Potential
+
+
+def configuration():
+    at = ase.build.bulk('Si', cubic=True) * (2, 2, 2)
+    at.rattle(0.05, seed=1)
+    return at
+
+
+def main(port, client_id, binary, n_steps, output):
+    at = configuration()
+    at.calc = Potential('SocketPot server_ip=127.0.0.1 server_port={} client_id={} binary={}'.format(
+        port, client_id, binary))
+    results = {'energy': [], 'forces': [], 'stress': []}
+    for step in range(n_steps):
+        at.positions[0, 0] += 0.05
+        results['energy'].append(at.get_potential_energy())
+        results['forces'].append(at.get_forces().tolist())
+        results['stress'].append(at.get_stress().tolist())
+    with open(output, 'w') as f:
+        json.dump(results, f)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]), int(sys.argv[2]), sys.argv[3], int(sys.argv[4]), sys.argv[5])
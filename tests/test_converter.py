@@ -16,6 +16,7 @@
 # HQ X
 # HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
 
+import _quippy
 import quippy
 import quippytest
 import ase
@@ -166,6 +167,56 @@ class Test_Converter(quippytest.QuippyTestCase):
         self.assertRaises(TypeError, self._convert_at_add_arrays_and_info, at, add_arrays='dummy_void_2d')
         self.assertRaises(TypeError, self._convert_at_add_arrays_and_info, at, add_arrays='dummy_cplx_2d')
 
+    def test_convert_in_place(self):
+        at = self.at_base.copy()
+        at_quip = quippy.convert.ase_to_quip(at)
+
+        # positions, cell, velocities and numbers changed one after the other
+        at.positions[1, 1] += 0.2
+        at.set_cell([3.1, 3, 3])
+        at.set_momenta(at.get_momenta() * 2)
+        for step in range(2):
+            at_quip_2 = quippy.convert.ase_to_quip(at, quip_atoms=at_quip)
+            self.assertIs(at_quip_2, at_quip)
+
+            at_quip_ref = quippy.convert.ase_to_quip(at)
+            self.assertArrayAlmostEqual(at_quip.pos, at_quip_ref.pos)
+            self.assertArrayAlmostEqual(at_quip.lattice, at_quip_ref.lattice)
+            self.assertArrayAlmostEqual(at_quip.velo, at_quip_ref.velo)
+            self.assertArrayIntEqual(at_quip.z, at_quip_ref.z)
+            self.assertArrayIntEqual(at_quip.species, at_quip_ref.species)
+            at.numbers[0] = 8
+
+        # a different number of atoms needs a new object
+        self.assertIsNot(quippy.convert.ase_to_quip(at[:3], quip_atoms=at_quip), at_quip)
+
+    def test_convert_bulk_transfer(self):
+        at_quip = quippy.convert.ase_to_quip(self.at_base)
+        arrays = {'dummy_real_1d': self.ref_real_1d, 'dummy_real_2d': self.ref_real_2d,
+                  'dummy_int_2d': self.ref_int_2d, 'dummy_bool_1d': self.ref_bool_1d}
+        params = dict(self.ref_info, int_2d=self.ref_int_2d, real_2d=self.ref_real_2d)
+
+        # nothing is added if any of the values is not supported
+        self.assertRaises(TypeError, quippy.convert.add_property_arrays, at_quip,
+                          dict(arrays, dummy_bool_2d=self.ref_bool_2d))
+        self.assertFalse(at_quip.has_property('dummy_real_1d'))
+
+        quippy.convert.add_property_arrays(at_quip, arrays)
+        quippy.convert.add_param_values(at_quip, params)
+        _quippy.f90wrap_dictionary_set_value_s(this=at_quip.params._handle, key='string', value='abc')
+
+        raw_arrays = quippy.convert.get_dict_arrays(at_quip.properties)
+        for key, value in arrays.items():
+            self.assertArrayAlmostEqual(raw_arrays[key], value.T)
+
+        raw_info = quippy.convert.get_dict_arrays(at_quip.params)
+        self.assertEqual(raw_info['integer'], self.ref_info['integer'])
+        self.assertAlmostEqual(raw_info['real'], self.ref_info['real'], delta=1E-06)
+        self.assertEqual(raw_info['logical_T'], self.ref_info['logical_T'])
+        self.assertArrayIntEqual(raw_info['int_2d'], self.ref_int_2d.T)
+        self.assertArrayAlmostEqual(raw_info['real_2d'], self.ref_real_2d.T)
+        self.assertEqual(raw_info['string'], 'abc')
+
     @staticmethod
     def _convert_at_add_arrays_and_info(at, add_info=None, add_arrays=None):
         """
@@ -17,7 +17,9 @@
 # HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
 
 import unittest
+from unittest import mock
 import os
+import tempfile
 
 import numpy as np
 import ase
@@ -222,6 +224,120 @@ class Test_Descriptor(quippytest.QuippyTestCase):
         # test the gradient's values
         self.assertArrayAlmostEqual(data['grad_data'][:2], self.ref_grad_array)
 
+    def test_descriptor_connectivity_reuse(self):
+        desc = quippy.descriptors.Descriptor("soap cutoff=1.3 l_max=4 n_max=4 atom_sigma=0.5 n_Z=2 Z={1 6}")
+        at = quippy.convert.ase_to_quip(self.at_C2H)
+
+        desc.calc(at)
+        connect_state = at._descriptor_connect_state
+        desc.count(at)
+        self.assertEqual(at._descriptor_connect_state, connect_state)
+
+        # moving an atom means the connectivity needs to be calculated again
+        at.pos[2, 0] += 0.05
+        data = desc.calc(at)['data']
+        self.assertNotEqual(at._descriptor_connect_state, connect_state)
+
+        at_moved = self.at_C2H.copy()
+        at_moved.positions[0, 2] += 0.05
+        self.assertArrayAlmostEqual(data, desc.calc(at_moved)['data'])
+
+    def test_descriptor_conversion_reuse(self):
+        desc = quippy.descriptors.Descriptor("soap cutoff=1.3 l_max=4 n_max=4 atom_sigma=0.5 n_Z=2 Z={1 6}")
+        at = self.at_C2H.copy()
+
+        with mock.patch('quippy.convert.ase_to_quip', wraps=quippy.convert.ase_to_quip) as ase_to_quip:
+            desc.calc(at)
+            desc.count(at)
+            self.assertEqual(ase_to_quip.call_count, 1)
+
+            # the same geometry in another object, or a change of geometry, needs a new conversion
+            desc.count(at.copy())
+            self.assertEqual(ase_to_quip.call_count, 2)
+            desc.calc(at)
+            self.assertEqual(ase_to_quip.call_count, 3)
+            at.positions[0, 2] += 0.05
+            desc.calc(at)
+            self.assertEqual(ase_to_quip.call_count, 4)
+
+    def test_descriptor_packed(self):
+        desc = quippy.descriptors.Descriptor("soap cutoff=1.3 l_max=4 n_max=4 atom_sigma=0.5 n_Z=2 Z={1 6}")
+        data = desc.calc(self.at_C2H, grad=True)
+        packed = desc.calc(self.at_C2H, grad=True, packed=True)
+
+        self.assertArrayIntEqual(packed['ci_offsets'], np.array([0, 1, 2, 3]))
+        self.assertArrayIntEqual(packed['grad_offsets'], data['grad_offsets'])
+        self.assertIsInstance(packed['ii'], np.ndarray)
+        for key in ['ii', 'has_grad_data']:
+            self.assertArrayIntEqual(packed[key], np.concatenate(data[key]))
+        for i, ii in enumerate(data['ii']):
+            self.assertArrayIntEqual(packed['ii'][packed['grad_offsets'][i]:packed['grad_offsets'][i + 1]], ii)
+        self.assertArrayAlmostEqual(packed['grad_data'], data['grad_data'])
+
+    def test_descriptor_calc_many(self):
+        desc = quippy.descriptors.Descriptor("soap cutoff=1.3 l_max=4 n_max=4 atom_sigma=0.5 n_Z=2 Z={1 6}")
+        data = desc.calc_many([self.at_C2H, self.at_C2H], grad=True)
+
+        self.assertArrayIntEqual(data['descriptor_offsets'], np.array([0, 3, 6]))
+        self.assertArrayIntEqual(data['grad_offsets'], np.array([0, 7, 14]))
+        self.assertTupleEqual(data['data'].shape, (6, 51))
+        self.assertTupleEqual(data['grad_data'].shape, (14, 3, 51))
+
+        # indices are within each frame
+        self.assertArrayIntEqual(data['grad_index_0based'][7:], self.ref_grad_index_0based)
+        self.assertArrayAlmostEqual(data['grad_data'][7:9], self.ref_grad_array)
+
+    def test_descriptor_n_jobs(self):
+        desc = quippy.descriptors.Descriptor("soap cutoff=1.3 l_max=4 n_max=4 atom_sigma=0.5 n_Z=2 Z={1 6}")
+        frames = [self.at_C2H, self.at_C2H.copy(), self.at_C2H]
+        frames[1].positions[0, 0] += 0.1
+
+        serial = desc.calc(frames, grad=True)
+        parallel = desc.calc(frames, grad=True, n_jobs=2, chunksize=2)
+        self.assertEqual(len(parallel), len(frames))
+        for res1, res2 in zip(serial, parallel):
+            self.assertArrayAlmostEqual(res1['data'], res2['data'])
+            self.assertArrayAlmostEqual(res1['grad_data'], res2['grad_data'])
+            self.assertArrayIntEqual(res1['grad_index_0based'], res2['grad_index_0based'])
+
+        data = desc.calc_descriptor(frames, n_jobs=2)
+        for res1, d in zip(serial, data):
+            self.assertArrayAlmostEqual(res1['data'], d)
+
+    def test_descriptor_calc_to_disk(self):
+        desc = quippy.descriptors.Descriptor("soap cutoff=1.3 l_max=4 n_max=4 atom_sigma=0.5 n_Z=2 Z={1 6}")
+        frames = [self.at_C2H.copy() for _ in range(5)]
+        for i, at in enumerate(frames):
+            at.positions[0, 0] += 0.05 * i
+        ref = desc.calc_many(frames, grad=True)
+
+        with tempfile.TemporaryDirectory() as path:
+            # an interrupted run, resumed with the full list of frames
+            desc.calc_to_disk(frames[:3], path, grad=True, frames_per_chunk=2)
+            index = desc.calc_to_disk(frames, path, grad=True, frames_per_chunk=2)
+            self.assertListEqual(index['frame_offsets'], [0, 2, 3, 5])
+
+            chunks = quippy.descriptors.read_descriptor_chunks(path)
+            self.assertEqual(len(chunks), 3)
+            self.assertIsInstance(chunks[0]['data'], np.memmap)
+            for key in ['data', 'grad_data', 'grad_index_0based']:
+                self.assertArrayAlmostEqual(np.concatenate([chunk[key] for chunk in chunks]), ref[key])
+
+            with self.assertRaises(ValueError):
+                desc.calc_to_disk(frames, path, grad=False)
+            with self.assertRaises(ValueError):
+                desc.calc_to_disk(frames, path, grad=True, cutoff=2.0)
+            with self.assertRaises(ValueError):
+                desc.calc_to_disk(frames, path, grad=True, args_str='do_grad')
+
+            # resuming with different frames than those already done
+            changed = [at.copy() for at in frames]
+            changed[1].positions[1, 1] += 0.01
+            with self.assertRaises(ValueError):
+                desc.calc_to_disk(changed, path, grad=True)
+            with self.assertRaises(ValueError):
+                desc.calc_to_disk(frames[1:], path, grad=True)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -24,12 +24,100 @@ classes, for carrying out molecular dynamics simulations.
    :synopsis: Run molecular dynamics simulations
 """
 
+import os
+import tempfile
+
 import quippy
 import numpy as np
 
 import unittest
 import quippytest
 import ase.io
+import ase.build
+from ase.constraints import FixAtoms
+from ase.units import fs
+from quippy.dynamicalsystem import Dynamics, TrajectoryBuffer
+from quippy.potential import Potential
+
+
+class TestTrajectoryBuffer(quippytest.QuippyTestCase):
+    def setUp(self):
+        at = ase.build.bulk('Si', cubic=True)
+        at.set_velocities(np.random.RandomState(0).normal(size=(len(at), 3)))
+        self.at = quippy.convert.ase_to_quip(at)
+
+    def capture_steps(self, buffer, n_steps):
+        for step in range(n_steps):
+            self.at.pos[0, 0] = step
+            quippy.convert.add_param_value(self.at, 'nsteps', step)
+            buffer.capture(self.at)
+
+    def test_capture(self):
+        buffer = TrajectoryBuffer(4, properties=['pos', 'velo'], params=['nsteps'])
+        self.capture_steps(buffer, 3)
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual(buffer['pos'].shape, (3, len(self.at.z), 3))
+        self.assertArrayAlmostEqual(buffer['pos'][-1], self.at.pos.T)
+        self.assertArrayAlmostEqual(buffer['velo'][-1], self.at.velo.T)
+        self.assertArrayAlmostEqual(buffer['nsteps'], [0, 1, 2])
+
+    def test_ring(self):
+        buffer = TrajectoryBuffer(4, properties=['pos'], params=['nsteps'])
+        self.capture_steps(buffer, 6)
+        self.assertEqual(len(buffer), 4)
+        self.assertEqual(buffer.n_captured, 6)
+        self.assertArrayAlmostEqual(buffer['nsteps'], [2, 3, 4, 5])
+        self.assertArrayAlmostEqual(buffer['pos'][:, 0, 0], [2, 3, 4, 5])
+
+    def test_memmap(self):
+        with tempfile.TemporaryDirectory() as path:
+            filename = os.path.join(path, 'test_trajectory_buffer.npy')
+            buffer = TrajectoryBuffer(4, properties=['pos'], params=['nsteps'], filename=filename)
+            self.capture_steps(buffer, 3)
+            buffer.flush()
+            data = np.load(filename, mmap_mode='r')
+            self.assertArrayAlmostEqual(data['nsteps'][:3], [0, 1, 2])
+            self.assertArrayAlmostEqual(data['pos'][2], self.at.pos.T)
+            del data, buffer
+
+    def test_missing(self):
+        self.assertRaises(ValueError, TrajectoryBuffer(4, properties=['force']).capture, self.at)
+        self.assertRaises(ValueError, TrajectoryBuffer(4, properties=['pos'], params=['energy']).capture, self.at)
+
+
+class TestDynamicsStep(quippytest.QuippyTestCase):
+    sw_params = """
+    <SW_params n_types="1" label="PRB_31">
+    <per_type_data type="1" atomic_num="14" />
+    <per_pair_data atnum_i="14" atnum_j="14" AA="7.049556277" BB="0.6022245584"
+    p="4" q="0" a="1.80" sigma="2.0951" eps="2.1675" />
+    <per_triplet_data atnum_c="14" atnum_j="14" atnum_k="14"
+    lambda="21.0" gamma="1.20" eps="2.1675" />
+    </SW_params>
+    """
+
+    def run_dynamics(self, constraint):
+        at = ase.build.bulk('Si', cubic=True)
+        at.rattle(0.05, seed=1)
+        if constraint:
+            at.set_constraint(FixAtoms([]))
+        at.calc = Potential('IP SW', param_str=self.sw_params)
+        dyn = Dynamics(at, 1.0 * fs, trajectory=None, logfile=None)
+        momenta = []
+        dyn.attach(lambda: momenta.append(at.get_momenta()), interval=5)
+        dyn.run(20)
+        return at, momenta
+
+    def test_fast_step(self):
+        # without constraints, positions are shared with the Fortran atoms and momenta synced for observers
+        at_fast, momenta_fast = self.run_dynamics(constraint=False)
+        # a constraint that does nothing takes the full ASE path
+        at_full, momenta_full = self.run_dynamics(constraint=True)
+
+        self.assertEqual(len(momenta_fast), 4)
+        self.assertArrayAlmostEqual(momenta_fast, momenta_full)
+        self.assertArrayAlmostEqual(at_fast.get_positions(), at_full.get_positions())
+        self.assertArrayAlmostEqual(at_fast.get_momenta(), at_full.get_momenta())
 
 
 # class TestDynamicalSystem(quippytest.QuippyTestCase):
@@ -33,12 +33,16 @@ $bash: python2
  [ 1.37788647  4.08297002  4.12304365]]
 """
 
+import os
+import sys
+import tempfile
 import unittest
 import quippy
 import numpy as np
 import quippytest
 import ase.build
 import ase
+from ase.calculators.lj import LennardJones
 
 diamond_pos = np.array([[-0.04999922, 0.01792964, 0.01711494],
                         [1.32315378, 1.40346929, 1.31076982],
@@ -127,5 +131,31 @@ class TestCalculator_SW_Potential(quippytest.QuippyTestCase):
     #    self.assertArrayAlmostEqual(self.pot.get_numeric_forces(self.at), self.f_ref.T, tol=1e-4)
 
 
+class TestPersistentFilePot(quippytest.QuippyTestCase):
+    def setUp(self):
+        driver = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'filepot_driver.py')
+        self.tmpdir = tempfile.TemporaryDirectory()
+        filename = os.path.join(self.tmpdir.name, 'filepot')
+        self.pot = quippy.potential.Potential('FilePot command="{} {}" filename={} persistent=T'.format(
+            sys.executable, driver, filename), calc_args='FilePot_log=F')
+        self.at = ase.Atoms('Si8', positions=diamond_pos, pbc=True, cell=[5.44, 5.44, 5.44])
+        self.at.calc = self.pot
+
+        self.ref_at = self.at.copy()
+        self.ref_at.calc = LennardJones(sigma=2.0, epsilon=1.0, rc=5.0)
+
+    def test_persistent_driver(self):
+        # the driver started for the first calculation answers the later ones
+        for step in range(3):
+            self.at.positions[0, 0] += 0.05
+            self.ref_at.positions[:] = self.at.positions
+            self.assertAlmostEqual(self.at.get_potential_energy(), self.ref_at.get_potential_energy())
+            self.assertArrayAlmostEqual(self.at.get_forces(), self.ref_at.get_forces(), tol=1E-06)
+            self.assertArrayAlmostEqual(self.at.get_stress(), self.ref_at.get_stress(), tol=1E-06)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -47,5 +47,18 @@ class TestCalculator_GAP_Potential(quippytest.QuippyTestCase):
     def test_forces(self):
         self.assertArrayAlmostEqual(self.at.get_forces(), self.forces_ref, tol=1E-06)
 
+    def test_calc_many(self):
+        frames = [self.at.copy(), self.at.copy()]
+        frames[1].positions[0, 0] += 0.1
+        energy_ref = [self.at.get_potential_energy(), self.pot_calculator.get_potential_energy(frames[1])]
+
+        for n_workers in [None, 2]:
+            results = self.pot_calculator.calc_many(frames, properties=['energy', 'forces', 'virial'],
+                                                    n_workers=n_workers)
+            self.assertArrayAlmostEqual(results['energy'], energy_ref)
+            self.assertArrayAlmostEqual(results['offsets'], [0, len(self.at), 2 * len(self.at)])
+            self.assertArrayAlmostEqual(results['forces'][:len(self.at)], self.forces_ref, tol=1E-06)
+            self.assertEqual(results['virial'].shape, (2, 3, 3))
+
 if __name__ == '__main__':
     unittest.main()
@@ -19,8 +19,11 @@
 import unittest
 
 import ase
+import ase.build
+import ase.neighborlist
 import numpy as np
 import quippytest
+from quippy.convert import ase_to_quip, get_neighbour_list
 from quippy.potential import Potential
 
 xml_string = """
@@ -86,6 +89,87 @@ class Test_NeighbourList(quippytest.QuippyTestCase):
         e = at.get_potential_energy()
         self.assertAlmostEqual(e, 20.863001205176083)
 
+    def test_get_neighbour_list(self):
+        at = ase.build.bulk('Si', cubic=True) * (2, 2, 2)
+        at.rattle(0.1, seed=1)
+        cutoff = 3.0
+        quip_atoms = ase_to_quip(at)
+        quip_atoms.set_cutoff(cutoff + 1.0)
+
+        index, j, shift, distance, diff = get_neighbour_list(quip_atoms, cutoff=cutoff, diff=True)
+        self.assertEqual(len(index), len(at) + 1)
+        self.assertEqual(index[-1], len(j))
+        i = np.repeat(np.arange(len(at)), np.diff(index))
+
+        # neighbours of each atom come in the same order as from the Fortran neighbour() loop
+        neighbours = [quip_atoms.neighbour(4, n, max_dist=cutoff) for n in range(1, quip_atoms.n_neighbours(4) + 1)]
+        self.assertArrayAlmostEqual(j[index[3]:index[4]] + 1, [n for n in neighbours if n != 0])
+
+        ase_i, ase_j, ase_shift, ase_distance, ase_diff = ase.neighborlist.neighbor_list('ijSdD', at, cutoff)
+        order = np.lexsort((shift[:, 2], shift[:, 1], shift[:, 0], j, i))
+        ase_order = np.lexsort((ase_shift[:, 2], ase_shift[:, 1], ase_shift[:, 0], ase_j, ase_i))
+        self.assertArrayAlmostEqual(i[order], ase_i[ase_order])
+        self.assertArrayAlmostEqual(j[order], ase_j[ase_order])
+        self.assertArrayAlmostEqual(shift[order], ase_shift[ase_order])
+        self.assertArrayAlmostEqual(distance[order], ase_distance[ase_order])
+        self.assertArrayAlmostEqual(diff[order], ase_diff[ase_order])
+
+        # without a cutoff, the full list up to the connectivity cutoff is returned
+        index, j, shift, distance = get_neighbour_list(quip_atoms)
+        self.assertEqual(len(j), quip_atoms.n_neighbours_total())
+        self.assertTrue(distance.max() > cutoff)
+
+    def neighbour_pairs(self, quip_atoms, cutoff, calc_connect=True):
+        """Pairs closer than `cutoff` as sorted (i, j, shift) and their distances"""
+        index, j, shift, distance = get_neighbour_list(quip_atoms, cutoff=cutoff, calc_connect=calc_connect)
+        i = np.repeat(np.arange(quip_atoms.n), np.diff(index))
+        order = np.lexsort((shift[:, 2], shift[:, 1], shift[:, 0], j, i))
+        return np.c_[i, j, shift][order], distance[order]
+
+    def check_strain(self, quip_atoms, deformation, moves, cutoff, rebuild):
+        """Deforms the cell of `quip_atoms` and moves its atoms, checking the skinned neighbour list against a new one"""
+        quip_atoms.set_lattice(np.dot(deformation, quip_atoms.lattice), scale_positions=True)
+        quip_atoms.pos[...] += moves.T
+        did_rebuild = np.zeros((), dtype=np.int32)
+        quip_atoms.calc_connect(did_rebuild=did_rebuild)
+        self.assertEqual(bool(did_rebuild), rebuild)
+
+        at = ase.Atoms(numbers=quip_atoms.z, positions=quip_atoms.pos.T, cell=quip_atoms.lattice.T, pbc=True)
+        fresh = ase_to_quip(at)
+        fresh.set_cutoff(cutoff)
+        pairs, distance = self.neighbour_pairs(quip_atoms, cutoff, calc_connect=False)
+        fresh_pairs, fresh_distance = self.neighbour_pairs(fresh, cutoff)
+        self.assertArrayIntEqual(pairs, fresh_pairs)
+        self.assertArrayAlmostEqual(distance, fresh_distance)
+
+    def test_skin_strain(self):
+        at = ase.build.bulk('Si', cubic=True) * (3, 3, 3)
+        at.rattle(0.05, seed=1)
+        cutoff, skin = 3.0, 1.0
+        quip_atoms = ase_to_quip(at)
+        quip_atoms.set_cutoff(cutoff, cutoff_skin=skin)
+
+        did_rebuild = np.zeros((), dtype=np.int32)
+        quip_atoms.calc_connect(did_rebuild=did_rebuild)
+        self.assertTrue(did_rebuild)
+        quip_atoms.calc_connect(did_rebuild=did_rebuild)
+        self.assertFalse(did_rebuild)
+
+        rng = np.random.RandomState(1)
+        no_moves = np.zeros((len(at), 3))
+        small_strain = np.eye(3) + 0.005 * np.array([[1.0, 0.4, 0.0], [0.4, -1.0, 0.2], [0.0, 0.2, 0.5]])
+
+        # within the skin, so the neighbour list is reused, also for the strain accumulated over two steps
+        self.check_strain(quip_atoms, small_strain, rng.uniform(-0.05, 0.05, (len(at), 3)), cutoff, rebuild=False)
+        self.check_strain(quip_atoms, small_strain, no_moves, cutoff, rebuild=False)
+
+        # beyond the skin, by straining the cell or moving an atom, which needs a rebuild
+        self.check_strain(quip_atoms, 1.15 * np.eye(3), no_moves, cutoff, rebuild=True)
+        large_move = no_moves.copy()
+        large_move[0] = [0.6, 0.0, 0.0]
+        self.check_strain(quip_atoms, small_strain, large_move, cutoff, rebuild=True)
+        self.check_strain(quip_atoms, np.linalg.inv(small_strain), no_moves, cutoff, rebuild=False)
+
 
 if __name__ == '__main__':
     unittest.main()
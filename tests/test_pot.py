@@ -149,6 +149,61 @@ class TestCalculator_SW_Potential(quippytest.QuippyTestCase):
         f = pot2.get_forces(self.at)
         self.assertArrayAlmostEqual(f, self.forces_ref*1.01, tol=1E-06)
 
+    def test_reuse_quip_atoms(self):
+        pot2 = Potential('IP SW', param_str=self.xml, reuse_quip_atoms=True, cutoff_skin=0.5)
+        at2 = self.at.copy()
+        at2.set_calculator(pot2)
+
+        self.assertAlmostEqual(at2.get_potential_energy(), self.energy_ref)
+        quip_atoms = pot2._quip_atoms
+
+        # small moves and a change of cell keep the same Fortran Atoms object
+        for displacement, scale in [(0.01, 1.0), (0.2, 1.0), (0.0, 1.01)]:
+            at2.positions[0, 0] += displacement
+            at2.set_cell(at2.cell * scale, scale_atoms=True)
+            self.at.positions[:] = at2.positions
+            self.at.set_cell(at2.cell)
+            self.assertAlmostEqual(at2.get_potential_energy(), self.at.get_potential_energy())
+            self.assertArrayAlmostEqual(at2.get_forces(), self.at.get_forces(), tol=1E-06)
+            self.assertArrayAlmostEqual(at2.get_stress(), self.at.get_stress())
+            self.assertIs(pot2._quip_atoms, quip_atoms)
+
+    def test_output_buffers(self):
+        self.at.get_forces()
+        buffer = self.pot_calculator._output_buffers['force']
+        results = self.pot_calculator.results
+        self.assertFalse(np.shares_memory(results['forces'], buffer))
+
+        # the buffer is reused for the next calculation, results already held are not affected
+        self.at.positions[0, 0] += 0.1
+        f2 = self.at.get_forces()
+        self.assertArrayAlmostEqual(results['forces'], self.forces_ref, tol=1E-06)
+        self.assertFalse(np.allclose(results['forces'], f2))
+        self.assertIs(self.pot_calculator._output_buffers['force'], buffer)
+
+    def test_lazy_extra_results(self):
+        pot2 = Potential('IP SW', param_str=self.xml, add_arrays=['dummy', 'unread'])
+        self.at.arrays['dummy'] = np.arange(len(self.at) * 2.).reshape(len(self.at), 2)
+        self.at.arrays['unread'] = np.arange(len(self.at) * 3.).reshape(len(self.at), 3)
+        dummy = self.at.arrays['dummy'].copy()
+        self.at.set_calculator(pot2)
+
+        self.at.get_potential_energy()
+        extra_atoms = pot2.extra_results['atoms']
+        self.assertIn('dummy', extra_atoms)
+        self.assertIn('unread', extra_atoms)
+        self.assertArrayAlmostEqual(extra_atoms['dummy'], dummy)
+        self.assertTrue(extra_atoms['dummy'].flags.c_contiguous)
+
+        # arrays read before the next calculation keep their values, the rest are dropped
+        self.at.arrays['dummy'] += 1.0
+        self.at.positions[0, 0] += 0.1
+        self.at.get_potential_energy()
+        self.assertArrayAlmostEqual(extra_atoms['dummy'], dummy)
+        self.assertNotIn('unread', extra_atoms)
+        self.assertRaises(KeyError, extra_atoms.__getitem__, 'unread')
+        self.assertArrayAlmostEqual(pot2.extra_results['atoms']['dummy'], dummy + 1.0)
+
     # def test_numeric_forces(self):
     #    self.assertArrayAlmostEqual(self.pot.get_numeric_forces(self.at), self.f_ref.T, tol=1e-4)
 
@@ -181,7 +236,49 @@ class TestPotential(quippytest.QuippyTestCase):
             E2.append(at.get_potential_energy())
             
         self.assertAlmostEqual(E1, E2)  
-            
+
+
+class TestCallbackPot(quippytest.QuippyTestCase):
+
+    @staticmethod
+    def pair_energy(positions):
+        # sum of (r - 1.5)**2 over all pairs, for an array of configurations
+        r = np.linalg.norm(positions[:, :, None, :] - positions[:, None, :, :], axis=-1)
+        return 0.5 * ((r - 1.5) ** 2 * (1 - np.eye(positions.shape[1]))).sum(axis=(1, 2))
+
+    def setUp(self):
+        self.at = Atoms('Si8', positions=diamond_pos, cell=[5.44, 5.44, 5.44])
+        self.batch_sizes = []
+
+        def callback(Z, lattice, positions, results, args_str):
+            self.batch_sizes.append(len(positions))
+            results['energy'][:] = self.pair_energy(positions)
+
+        self.pot = Potential('CallbackPot batch_size=10')
+        self.pot.set_callback(callback)
+
+    def test_energy(self):
+        self.at.calc = self.pot
+        self.assertAlmostEqual(self.at.get_potential_energy(), self.pair_energy(diamond_pos[None])[0])
+        self.assertEqual(self.batch_sizes, [1])
+
+    def test_fd_forces(self):
+        d = diamond_pos[:, None, :] - diamond_pos[None, :, :]
+        r = np.linalg.norm(d, axis=-1) + np.eye(len(diamond_pos))
+        forces_ref = -(2 * ((r - 1.5) / r * (1 - np.eye(len(diamond_pos))))[:, :, None] * d).sum(axis=1)
+
+        self.pot.calculate(self.at, properties=['energy', 'forces'], calc_args='force_using_fd')
+        self.assertArrayAlmostEqual(self.pot.results['forces'], forces_ref, tol=1e-6)
+        # 48 displaced configurations in batches of 10, after the energy itself
+        self.assertEqual(self.batch_sizes, [1, 10, 10, 10, 10, 8])
+
+    def test_callback_error(self):
+        def callback(Z, lattice, positions, results, args_str):
+            raise ValueError('callback failed')
+
+        self.pot.set_callback(callback)
+        self.assertRaises(RuntimeError, self.pot.get_potential_energy, self.at)
+
 
 if __name__ == '__main__':
     unittest.main()
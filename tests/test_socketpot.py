@@ -0,0 +1,152 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2019
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import ase.build
+import numpy as np
+from ase.calculators.lj import LennardJones
+
+import quippytest
+import socketpot_client
+from quippy.potential import Potential
+from quippy.socketserver import pack_binary_request, unpack_binary_request, pack_binary_reply, unpack_binary_reply
+
+
+def lennard_jones():
+    return LennardJones(sigma=2.0, epsilon=1.0, rc=5.0)
+
+
+class TestBinaryMessages(quippytest.QuippyTestCase):
+
+    def setUp(self):
+        self.at = ase.build.bulk('Si', cubic=True)
+        self.at.rattle(0.05, seed=1)
+
+    def test_request(self):
+        data = pack_binary_request(self.at, 3, args_str='a=1')
+        at, label, flags, args_str = unpack_binary_request(data)
+        self.assertEqual(len(data), 20 + 8 * (9 + 3 * len(self.at)) + 4 * len(self.at) + 3)
+        self.assertEqual((label, args_str), (3, 'a=1'))
+        self.assertArrayAlmostEqual(at.positions, self.at.positions, tol=0.0)
+        self.assertArrayAlmostEqual(at.cell, self.at.cell, tol=0.0)
+        self.assertTrue((at.numbers == self.at.numbers).all())
+        self.assertTrue(at.pbc.all())
+
+    def test_request_pbc(self):
+        for pbc in ([False, False, False], [True, False, True], [False, True, False]):
+            self.at.pbc = pbc
+            at, label, flags, args_str = unpack_binary_request(pack_binary_request(self.at, 1))
+            self.assertEqual(at.pbc.tolist(), pbc)
+
+    def test_reply(self):
+        results = {'energy': 1.5, 'forces': np.random.normal(size=(len(self.at), 3)),
+                   'virial': np.arange(9.0).reshape(3, 3), 'local_e': np.arange(len(self.at), dtype=float)}
+        label, results2 = unpack_binary_reply(pack_binary_reply(len(self.at), 4, results))
+        self.assertEqual(label, 4)
+        self.assertEqual(sorted(results2.keys()), sorted(results.keys()))
+        for key in results:
+            self.assertArrayAlmostEqual(results2[key], results[key], tol=0.0)
+
+
+class TestSocketPot(quippytest.QuippyTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # the server runs in its own process, as the quippy client blocks while waiting for it
+        server = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'socketpot_server.py')
+        cls.server = subprocess.Popen([sys.executable, server], stdout=subprocess.PIPE)
+        cls.port = int(cls.server.stdout.readline())
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.terminate()
+        cls.server.wait()
+
+    def setUp(self):
+        self.at = socketpot_client.configuration()
+        self.ref_at = self.at.copy()
+        self.ref_at.calc = lennard_jones()
+
+    def test_raw_binary_exchange(self):
+        data = pack_binary_request(self.at, 7)
+        with socket.create_connection(('127.0.0.1', self.port)) as sock:
+            sock.sendall(b'B%7d' % 99 + struct.pack('=q', len(data)) + data)
+            reply = b''
+            while not reply.endswith(b'done.'):
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                reply += chunk
+        label, results = unpack_binary_reply(reply[8:-5])
+        self.assertEqual(label, 8)
+        self.assertAlmostEqual(results['energy'], self.ref_at.get_potential_energy())
+        self.assertArrayAlmostEqual(results['forces'], self.ref_at.get_forces())
+
+    def _check_clients(self, binary, n_clients=4, n_steps=3):
+        # several clients, each in its own process, use the one server at the same time
+        client = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'socketpot_client.py')
+        with tempfile.TemporaryDirectory() as path:
+            outputs = [os.path.join(path, 'client_{}.json'.format(client_id)) for client_id in range(n_clients)]
+            clients = [subprocess.Popen([sys.executable, client, str(self.port), str(client_id),
+                                         'T' if binary else 'F', str(n_steps), output], stdout=subprocess.DEVNULL)
+                       for client_id, output in enumerate(outputs)]
+            for proc in clients:
+                self.assertEqual(proc.wait(), 0)
+            results = []
+            for output in outputs:
+                with open(output) as f:
+                    results.append(json.load(f))
+
+        tol = 1e-8 if binary else 1e-6  # XYZ text is rounded
+        for step in range(n_steps):
+            self.ref_at.positions[0, 0] += 0.05
+            for result in results:
+                self.assertAlmostEqual(result['energy'][step], self.ref_at.get_potential_energy(), places=5)
+                self.assertArrayAlmostEqual(result['forces'][step], self.ref_at.get_forces(), tol=tol)
+                self.assertArrayAlmostEqual(result['stress'][step], self.ref_at.get_stress(), tol=tol)
+
+    def test_xyz_clients(self):
+        self._check_clients(binary=False)
+
+    def test_binary_clients(self):
+        self._check_clients(binary=True)
+
+    def test_binary_non_periodic(self):
+        # a cluster, which would interact with its periodic images if the server assumed pbc
+        self.at.pbc = False
+        self.ref_at.pbc = False
+        self.at.calc = Potential('SocketPot server_ip=127.0.0.1 server_port={} client_id=10 binary=T'.format(self.port))
+        self.assertAlmostEqual(self.at.get_potential_energy(), self.ref_at.get_potential_energy(), places=8)
+        self.assertArrayAlmostEqual(self.at.get_forces(), self.ref_at.get_forces(), tol=1e-8)
+
+        periodic_at = self.ref_at.copy()
+        periodic_at.pbc = True
+        periodic_at.calc = lennard_jones()
+        self.assertGreater(abs(periodic_at.get_potential_energy() - self.ref_at.get_potential_energy()), 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2019
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+import os
+import unittest
+
+import ase.build
+import numpy as np
+import quippytest
+from quippy.potential import Potential
+
+PARAMS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'share', 'Parameters')
+
+
+class TestSplineTable(quippytest.QuippyTestCase):
+    """
+    Compares spline based potentials evaluated from splines tabulated on uniform grids
+    (`spline_table_points`) with the direct evaluation of the splines.
+    """
+
+    def calculate(self, init_args, param_file, at):
+        with open(os.path.join(PARAMS_DIR, param_file)) as f:
+            pot = Potential(init_args, param_str='<params>' + f.read() + '</params>')
+        at = at.copy()
+        at.calc = pot
+        return {'energy': at.get_potential_energy(), 'forces': at.get_forces(),
+                'virial': pot.get_virial(at), 'energies': at.get_potential_energies()}
+
+    def check_tabulated(self, init_args, param_file, at, tol):
+        direct = self.calculate(init_args, param_file, at)
+        errors = []
+        for n_points in [2000, 20000]:
+            tabulated = self.calculate('{} spline_table_points={}'.format(init_args, n_points), param_file, at)
+            self.assertAlmostEqual(tabulated['energy'], direct['energy'], delta=tol)
+            for key in ['forces', 'virial', 'energies']:
+                self.assertArrayAlmostEqual(tabulated[key], direct[key], tol=tol)
+            errors.append(abs(tabulated['forces'] - direct['forces']).max())
+
+        # cubic Hermite segments, so the error falls with the fourth power of the spacing
+        self.assertLess(errors[1], 1e-2 * errors[0])
+
+    def test_eam_ercolessi_adams(self):
+        at = ase.build.bulk('Al', 'fcc', a=4.05, cubic=True) * (3, 3, 3)
+        at.rattle(0.1, seed=1)
+        self.check_tabulated('IP EAM_ErcolAd', 'ip.parms.EAM_ErcolAd.xml', at, tol=1e-5)
+
+    def test_glue(self):
+        at = ase.build.bulk('Si', cubic=True) * (2, 2, 2)
+        at.rattle(0.1, seed=1)
+        # with some oxygen, for the Si-O pair potential
+        at.numbers[::8] = 8
+        self.check_tabulated('IP Glue', 'ip.parms.Glue.xml', at, tol=1e-4)
+
+
+if __name__ == '__main__':
+    unittest.main()
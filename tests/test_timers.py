@@ -0,0 +1,72 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2019
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+import json
+import unittest
+
+import quippy
+import quippytest
+from quippy import timers
+
+
+class TestTimers(quippytest.QuippyTestCase):
+    def setUp(self):
+        timers.reset_timers()
+        timers.enable_timers()
+
+    def tearDown(self):
+        timers.disable_timers()
+        timers.reset_timers()
+
+    def time_regions(self):
+        quippy.system_module.system_timer('test_outer')
+        for i in range(3):
+            quippy.system_module.system_timer('test_inner')
+            quippy.system_module.system_timer('test_inner')
+        quippy.system_module.system_timer('test_outer')
+
+    def test_tree(self):
+        self.time_regions()
+        self.time_regions()
+
+        outer = timers.get_timers()['test_outer']
+        self.assertEqual(outer['n_calls'], 2)
+        inner = outer['children']['test_inner']
+        self.assertEqual(inner['n_calls'], 6)
+        self.assertEqual(inner['children'], {})
+        self.assertLessEqual(inner['wall_min'], inner['wall_mean'])
+        self.assertLessEqual(inner['wall_mean'], inner['wall_max'])
+        self.assertLessEqual(inner['wall_total'], outer['wall_total'])
+
+    def test_reset(self):
+        self.time_regions()
+        timers.reset_timers()
+        self.assertNotIn('test_outer', timers.get_timers())
+
+        quippy.system_module.system_timer('test_inner')
+        quippy.system_module.system_timer('test_inner')
+        self.assertEqual(timers.get_timers()['test_inner']['n_calls'], 1)
+
+    def test_json(self):
+        self.time_regions()
+        data = json.loads(timers.timers_to_json())
+        self.assertEqual(data['test_outer']['children']['test_inner']['n_calls'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()